@@ -0,0 +1,85 @@
+"""Throughput of DatabaseManager.save_health_records_bulk.
+
+Usage (from the repo root, against a development database):
+    DB_URL=postgresql://... python -m benchmarks.bulk_insert [--rows 200000] [--chunk-rows 50000]
+
+Saves --rows synthetic records to a throwaway patient, once each from a
+DataFrame, a generator of tuples and a numeric 2-D array (so patient_id and
+gender arrive as floats), and prints rows/second for each. Checks
+that the returned record_ids point at the rows in input order; the
+throwaway users are deleted afterwards (the records cascade).
+"""
+import argparse
+import sys
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+import database
+import migrations
+from prediction import input_keys, synthetic_inputs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--chunk-rows", type=int, default=database.BULK_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    migrations.run_pending()
+    db = database.DatabaseManager()
+    X = synthetic_inputs(args.rows, seed=7)
+    risk = np.linspace(0, 100, args.rows)
+
+    failures = 0
+    for label in ["DataFrame", "tuple generator", "numeric array"]:
+        tag = uuid.uuid4().hex[:8]
+        user_id = db.create_user(f"bulk_{tag}", f"bulk_{tag}@example.com", "x")
+        if user_id is None:
+            print("❌ Could not create the throwaway user", file=sys.stderr)
+            return 1
+        try:
+            db.create_patient(user_id, "Bulk Insert", None, "Male", "000")
+            patient_id = db.get_patient_by_user(user_id)["patient_id"]
+
+            frame = pd.DataFrame(X, columns=input_keys)
+            frame["gender"] = frame["gender"].astype(int)
+            frame["patient_id"] = patient_id
+            frame["risk_score"] = risk
+            frame["risk_category"] = np.where(risk > 50, "High Risk", "Low Risk")
+            frame["notes"] = "bulk insert benchmark"
+            if label == "DataFrame":
+                records = frame
+            elif label == "numeric array":
+                records = frame[["patient_id"] + input_keys + ["risk_score"]].to_numpy(dtype=float)
+            else:
+                records = (
+                    (r.patient_id, r.age, r.gender, r.bmi, r.chol, r.tg, r.hdl, r.ldl,
+                     r.risk_score, r.risk_category, r.notes)
+                    for r in frame.itertuples(index=False)
+                )
+
+            start = time.perf_counter()
+            record_ids = db.save_health_records_bulk(records, chunk_rows=args.chunk_rows)
+            elapsed = time.perf_counter() - start
+            if record_ids is None or len(record_ids) != args.rows:
+                print(f"❌ {label}: save failed")
+                failures += 1
+                continue
+
+            saved = db.get_patient_records(patient_id, columns=["risk_score"])
+            by_id = {r["record_id"]: r["risk_score"] for r in saved}
+            in_order = len(by_id) == args.rows and np.allclose([by_id[i] for i in record_ids], risk)
+            failures += not in_order
+            print(f"{'✅' if in_order else '❌'} {label}: {args.rows:,} rows in {elapsed:.2f}s "
+                  f"= {args.rows / elapsed:,.0f} rows/s"
+                  + ("" if in_order else " (record_ids don't match the input rows)"))
+        finally:
+            db.delete_user(user_id)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
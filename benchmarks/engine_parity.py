@@ -0,0 +1,68 @@
+"""Parity and latency check for the numpy forest engine.
+
+Usage (from the repo root):
+    python -m benchmarks.engine_parity [--model best_model]
+
+Compares forest_engine against sklearn's predict_proba on synthetic inputs,
+then times both engines for batch sizes 1 through 100k. Exits non-zero if
+the probabilities differ.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import forest_engine
+import model_registry
+from prediction import feature_names, synthetic_inputs
+
+BATCH_SIZES = [1, 10, 100, 1000, 10000, 100000]
+
+
+def sklearn_proba(model, scaler, X):
+    return model.predict_proba(scaler.transform(pd.DataFrame(X, columns=feature_names)))
+
+
+def time_call(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="best_model", choices=["best_model", "random_forest"])
+    parser.add_argument("--parity-rows", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    model = model_registry.load_model(args.model)
+    scaler = model_registry.load_model("scaler")
+    compiled = forest_engine.export_forest(model, scaler)
+
+    X = synthetic_inputs(args.parity_rows, seed=42)
+    expected = sklearn_proba(model, scaler, X)
+    actual = forest_engine.predict_proba(compiled, X)
+    max_diff = float(np.abs(expected - actual).max())
+    identical = bool(np.array_equal(expected, actual))
+    print(f"Parity on {len(X):,} rows: identical={identical} max_abs_diff={max_diff:.3g}")
+
+    print(f"\n{'batch':>8} {'sklearn ms':>12} {'numpy ms':>12} {'speedup':>8}")
+    for size in BATCH_SIZES:
+        batch = synthetic_inputs(size, seed=size)
+        repeats = 20 if size <= 1000 else 3
+        sk = time_call(lambda: sklearn_proba(model, scaler, batch), repeats)
+        npy = time_call(lambda: forest_engine.predict_proba(compiled, batch), repeats)
+        print(f"{size:>8} {sk * 1000:>12.3f} {npy * 1000:>12.3f} {sk / npy:>7.1f}x")
+
+    # A forest fitted with n_jobs > 1 accumulates trees in thread order, so
+    # allow last-bit differences but nothing more
+    return 0 if np.allclose(expected, actual, rtol=0, atol=1e-12) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""Check that every DatabaseManager query can be answered from an index.
+
+Usage (from the repo root, against a development database):
+    DB_URL=postgresql://... python -m benchmarks.index_check
+
+Applies pending migrations, creates throwaway users, a patient and health
+records, then calls each DatabaseManager method on a connection that runs
+EXPLAIN before every statement. Sequential scans are disabled for the
+session, so the planner only picks one when no index fits; any Seq Scan on
+an application table is reported and the exit code is 1. The throwaway user
+accounts are deleted at the end (the foreign keys cascade).
+"""
+import argparse
+import datetime
+import json
+import sys
+import uuid
+
+import psycopg2.extensions
+from psycopg2 import sql
+
+import database
+import migrations
+
+APP_TABLES = {"users", "patients", "health_records"}
+
+_plans = []
+
+
+class ExplainingCursorMixin:
+    def execute(self, query, vars=None):
+        if isinstance(query, sql.Composable):
+            query = query.as_string(self.connection)
+        text = query.decode() if isinstance(query, bytes) else str(query)
+        if text.lstrip().split(None, 1)[0].upper() in {"SELECT", "UPDATE", "DELETE", "WITH"}:
+            super().execute("EXPLAIN (FORMAT JSON) " + text, vars)
+            row = self.fetchone()
+            plan = row[0] if isinstance(row, tuple) else next(iter(row.values()))
+            _plans.append((" ".join(text.split()), plan[0]["Plan"]))
+        return super().execute(query, vars)
+
+
+class ExplainingConnection(psycopg2.extensions.connection):
+    def cursor(self, *args, cursor_factory=None, **kwargs):
+        base = cursor_factory or psycopg2.extensions.cursor
+        explaining = type(f"Explaining{base.__name__}", (ExplainingCursorMixin, base), {})
+        return super().cursor(*args, cursor_factory=explaining, **kwargs)
+
+
+def seq_scans(plan):
+    found = []
+    if plan.get("Node Type") == "Seq Scan" and plan.get("Relation Name") in APP_TABLES:
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found += seq_scans(child)
+    return found
+
+
+def exercise(db):
+    """Call every DatabaseManager method once.
+
+    Returns {method: (start, stop)} slices into the recorded plans.
+    """
+    tag = uuid.uuid4().hex[:8]
+    calls = {}
+
+    def record(name, fn, *args):
+        before = len(_plans)
+        result = fn(*args)
+        calls[name] = (before, len(_plans))
+        return result
+
+    user_id = record("create_user", db.create_user, f"idx_{tag}", f"idx_{tag}@example.com", "x")
+    if user_id is None:
+        raise RuntimeError("Could not create the throwaway user")
+    record("get_user_by_username", db.get_user_by_username, f"idx_{tag}")
+    record("get_user_by_email", db.get_user_by_email, f"idx_{tag}@example.com")
+    record("get_session_user", db.get_session_user, f"idx_{tag}")
+    record("get_session_user[id]", db.get_session_user, None, user_id)
+    record("get_user_by_id", db.get_user_by_id, user_id)
+    record("create_patient", db.create_patient, user_id, "Index Check", datetime.date(1970, 1, 1), "Male", "000")
+    patient = record("get_patient_by_user", db.get_patient_by_user, user_id)
+    record("get_existing_patient_ids", db.get_existing_patient_ids, [patient["patient_id"], -1])
+    record("update_patient", db.update_patient, patient["patient_id"], "Index Check", datetime.date(1970, 1, 1), "Male", "001")
+    sample = {"age": 50, "gender": 1, "bmi": 25.0, "chol": 200, "tg": 150, "hdl": 50, "ldl": 120}
+    record("save_health_record", db.save_health_record, patient["patient_id"], sample, 12.5, "Low Risk", "index check")
+    record("save_health_records_bulk", db.save_health_records_bulk,
+           [(patient["patient_id"], 50.0, 1, 25.0, 200.0, 150.0, 50.0, 120.0, 12.5, "Low Risk", "index check", None)])
+    record("get_patient_records", db.get_patient_records, patient["patient_id"])
+    page = db.get_patient_records(patient["patient_id"], limit=1)
+    record("get_patient_records[page]", db.get_patient_records, patient["patient_id"],
+           datetime.date(2000, 1, 1), datetime.date.today(), ["risk_score"], 25,
+           (page[0]["created_at"], page[0]["record_id"]))
+    record("get_patient_record_summary", db.get_patient_record_summary, patient["patient_id"],
+           datetime.date(2000, 1, 1), datetime.date.today())
+    record("get_risk_trend", db.get_risk_trend, patient["patient_id"],
+           datetime.date(2000, 1, 1), datetime.date.today(), "week")
+    record("search_users", db.search_users)
+    record("search_users[prefix]", db.search_users, "id", 25, "a")
+    record("search_users[substring]", db.search_users, tag, 25)
+    record("count_users", db.count_users, "id")
+    record("get_admin_stats", db.get_admin_stats)
+    record("delete_user", db.delete_user, user_id)
+    other_id = db.create_user(f"idx2_{tag}", f"idx2_{tag}@example.com", "x")
+    record("delete_users", db.delete_users, [other_id])
+    return calls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--verbose", action="store_true", help="Print every plan")
+    args = parser.parse_args(argv)
+
+    migrations.run_pending()
+    pool = database.ConnectionPool(
+        database.DB_URL, minconn=1, maxconn=1,
+        connection_factory=ExplainingConnection, options="-c enable_seqscan=off",
+    )
+    db = database.DatabaseManager(pool)
+    calls = exercise(db)
+    pool.closeall()
+
+    failures = 0
+    for method, (start, stop) in calls.items():
+        for query, plan in _plans[start:stop]:
+            scanned = seq_scans(plan)
+            status = "❌" if scanned else "✅"
+            failures += bool(scanned)
+            detail = f" seq scan on {', '.join(scanned)}" if scanned else ""
+            print(f"{status} {method}: {query[:90]}{detail}")
+            if args.verbose:
+                print(json.dumps(plan, indent=2))
+        if start == stop:
+            print(f"➖ {method}: plain INSERTs only, nothing to scan")
+
+    if failures:
+        print(f"❌ {failures} statement(s) need a sequential scan")
+        return 1
+    print("✅ Every DatabaseManager query is index-backed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
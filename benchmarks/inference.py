@@ -0,0 +1,201 @@
+"""Inference benchmark for every model artifact.
+
+Usage (from the repo root):
+    python -m benchmarks.inference [--output results.json] [--compare baseline.json]
+
+For each .pkl in MODEL_FILES this records deserialization time, peak memory
+while loading, single-row p50/p99 latency through predict_heart_disease's
+preprocessing (one-row DataFrame -> scaler -> model) and batch throughput on
+synthetic inputs drawn from the form's valid ranges. The best model is also
+measured through the numpy forest engine. Results are written as JSON; with
+--compare, metrics that got worse than the threshold are listed and the exit
+code is 1.
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import forest_engine
+import model_registry
+from prediction import feature_names, synthetic_inputs
+
+BATCH_SIZES = [1, 100, 10000, 1000000]
+SINGLE_ROW_CALLS = 1000
+LOAD_REPEATS = 3
+
+# Metric name -> True when larger is better
+METRICS = {
+    "load_seconds": False,
+    "load_peak_bytes": False,
+    "single_row_p50_ms": False,
+    "single_row_p99_ms": False,
+}
+
+
+def measure_load(path):
+    best = float("inf")
+    peak = 0
+    for _ in range(LOAD_REPEATS):
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        artifact = joblib.load(path)
+        best = min(best, time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return artifact, best, peak
+
+
+def score_fn(name, artifact, scaler):
+    if name == "scaler":
+        return lambda X: artifact.transform(pd.DataFrame(X, columns=feature_names))
+    if hasattr(artifact, "predict_proba") and getattr(artifact, "probability", True):
+        predict = artifact.predict_proba
+    else:
+        predict = artifact.decision_function
+    return lambda X: predict(scaler.transform(pd.DataFrame(X, columns=feature_names)))
+
+
+def measure_single_row(fn):
+    X = synthetic_inputs(SINGLE_ROW_CALLS, seed=1)
+    fn(X[:1])  # warm-up
+    timings = np.empty(SINGLE_ROW_CALLS)
+    for i in range(SINGLE_ROW_CALLS):
+        start = time.perf_counter()
+        fn(X[i:i + 1])
+        timings[i] = time.perf_counter() - start
+    return float(np.percentile(timings, 50) * 1000), float(np.percentile(timings, 99) * 1000)
+
+
+def measure_throughput(fn, sizes):
+    throughput = {}
+    for size in sizes:
+        X = synthetic_inputs(size, seed=size)
+        repeats = 5 if size <= 10000 else 1
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn(X)
+            best = min(best, time.perf_counter() - start)
+        throughput[str(size)] = size / best
+    return throughput
+
+
+def run(sizes):
+    scaler = model_registry.load_model("scaler")
+    results = {}
+    for name in model_registry.MODEL_FILES:
+        path = model_registry.model_path(name)
+        print(f"▶ {name}", file=sys.stderr)
+        try:
+            artifact, load_seconds, load_peak = measure_load(path)
+        except Exception as e:
+            results[name] = {"error": str(e)}
+            continue
+        fn = score_fn(name, artifact, scaler)
+        p50, p99 = measure_single_row(fn)
+        results[name] = {
+            "file": os.path.basename(path),
+            "file_bytes": os.path.getsize(path),
+            "load_seconds": load_seconds,
+            "load_peak_bytes": load_peak,
+            "single_row_p50_ms": p50,
+            "single_row_p99_ms": p99,
+            "rows_per_second": measure_throughput(fn, sizes),
+        }
+
+    print("▶ best_model[numpy]", file=sys.stderr)
+    compiled = forest_engine.export_forest(model_registry.load_model("best_model"), scaler)
+    fn = lambda X: forest_engine.predict_proba(compiled, X)
+    p50, p99 = measure_single_row(fn)
+    results["best_model[numpy]"] = {
+        "single_row_p50_ms": p50,
+        "single_row_p99_ms": p99,
+        "rows_per_second": measure_throughput(fn, sizes),
+    }
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    versions = {}
+    for module in ("numpy", "pandas", "sklearn", "joblib", "xgboost"):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            versions[module] = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "versions": versions,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Metrics in `current` that are worse than `baseline` by more than threshold."""
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or "error" in result or "error" in base:
+            continue
+        pairs = [(metric, result.get(metric), base.get(metric), higher) for metric, higher in METRICS.items()]
+        pairs += [
+            (f"rows_per_second[{size}]", value, base.get("rows_per_second", {}).get(size), True)
+            for size, value in result.get("rows_per_second", {}).items()
+        ]
+        for metric, new, old, higher_is_better in pairs:
+            if new is None or not old:
+                continue
+            change = (old - new) / old if higher_is_better else (new - old) / old
+            if change > threshold:
+                regressions.append((name, metric, old, new, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--compare", help="Earlier results JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown (default: 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    report = {"environment": environment(), "batch_sizes": args.sizes, "results": run(args.sizes)}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Wrote {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for name, metric, old, new, change in regressions:
+            print(f"⚠️ {name} {metric}: {old:.4g} -> {new:.4g} ({change:+.0%} worse)")
+        if regressions:
+            return 1
+        print(f"✅ No regressions beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
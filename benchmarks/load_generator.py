@@ -0,0 +1,112 @@
+"""Load generator for inference_server.
+
+Usage (server running, from the repo root):
+    python -m benchmarks.load_generator [--url http://127.0.0.1:8000] \
+        [--concurrency 1 4 16 64] [--duration 10] [--output curve.json]
+
+At each concurrency level, that many client threads send single-row
+/predict requests back to back over keep-alive connections for --duration
+seconds. Prints one line per level (throughput, p50/p95/p99 latency, mean
+server batch size), which together trace the throughput vs latency curve.
+"""
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+from prediction import input_keys, synthetic_inputs
+
+
+def client(url, rows, stop_at, latencies, errors):
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+    i = 0
+    while time.perf_counter() < stop_at:
+        body = json.dumps({"input": dict(zip(input_keys, rows[i % len(rows)].tolist()))})
+        start = time.perf_counter()
+        try:
+            conn.request("POST", "/predict", body, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    conn.close()
+
+
+def server_stats(url):
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=10)
+    conn.request("GET", "/stats")
+    stats = json.loads(conn.getresponse().read())
+    conn.close()
+    return stats
+
+
+def run_level(url, concurrency, duration):
+    before = server_stats(url)
+    latencies, errors = [], []
+    stop_at = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=client, args=(url, synthetic_inputs(500, seed=i), stop_at, latencies, errors))
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    after = server_stats(url)
+
+    batches = after["batches"] - before["batches"]
+    rows = after["rows"] - before["rows"]
+    lat_ms = np.array(latencies) * 1000 if latencies else np.array([np.nan])
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": len(latencies) / duration,
+        "p50_ms": float(np.percentile(lat_ms, 50)),
+        "p95_ms": float(np.percentile(lat_ms, 95)),
+        "p99_ms": float(np.percentile(lat_ms, 99)),
+        "mean_batch_size": rows / batches if batches else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    parser.add_argument("--output", help="Write the curve as JSON")
+    args = parser.parse_args(argv)
+
+    stats = server_stats(args.url)
+    print(f"Server: max_batch_size={stats['max_batch_size']} max_wait_ms={stats['max_wait_ms']:g}")
+    print(f"{'clients':>8} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'batch':>7} {'errors':>7}")
+    curve = []
+    for concurrency in args.concurrency:
+        point = run_level(args.url, concurrency, args.duration)
+        curve.append(point)
+        print(f"{concurrency:>8} {point['throughput_rps']:>10,.0f} {point['p50_ms']:>9.2f} "
+              f"{point['p95_ms']:>9.2f} {point['p99_ms']:>9.2f} {point['mean_batch_size']:>7.1f} {point['errors']:>7}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"server": stats, "curve": curve}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Resident memory per worker for the app's model loading, with and without the export.
+
+Usage (from the repo root, after `python -m forest_engine`):
+    python -m benchmarks.mmap_memory [--workers 4] [--bulk]
+
+Starts N worker processes per mode. Each one goes through what an app
+process does: the import-time preload and explanation warm-up from app.py,
+then a risk assessment (predict_heart_disease + explain_heart_disease) and a
+small batch. It reports Rss, Pss (proportional share of shared pages) and
+private memory added, averaged across workers, and whether the forest's
+pickle ended up loaded. Modes:
+
+    pickle  - COMPILED_DIR pointed at an empty directory, so the forest is
+              unpickled and the attribution table built in every worker
+    export  - the export under COMPILED_DIR, memory-mapped and shared
+
+--bulk also scores a batch above AUTO_NUMPY_MAX_ROWS, which goes to sklearn
+and so loads the pickle in both modes.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+
+# Nothing from the app is imported at module level: spawned workers import
+# this module, and the app's imports are part of what they measure
+MODES = ["pickle", "export"]
+
+
+def memory_kb():
+    # Linux only: smaps_rollup sums every mapping of the process
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def worker(compiled_dir, bulk, loaded, release, results):
+    os.environ["COMPILED_DIR"] = compiled_dir
+    before = memory_kb()
+
+    import explain
+    import model_registry
+    import prediction
+
+    # app.py at import time
+    prediction.preload()
+    explain.get_explainer()
+    # A risk assessment, then a small batch
+    X = prediction.synthetic_inputs(1000, seed=os.getpid())
+    patient = dict(zip(prediction.input_keys, X[0]))
+    prediction.predict_heart_disease(patient)
+    prediction.explain_heart_disease(patient)
+    prediction.predict_heart_disease_batch(X[:prediction.AUTO_NUMPY_MAX_ROWS])
+    if bulk:
+        prediction.predict_heart_disease_batch(X)
+
+    # Measure only once every worker has mapped the arrays, so Pss reflects
+    # how many processes share each page
+    loaded.wait()
+    after = memory_kb()
+    delta = {key: after[key] - before[key] for key in after}
+    delta["pickle_loaded"] = model_registry.is_loaded("best_model")
+    results.put(delta)
+    release.wait()
+
+
+def run_mode(compiled_dir, workers, bulk):
+    ctx = mp.get_context("spawn")
+    loaded = ctx.Barrier(workers)
+    release = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=worker, args=(compiled_dir, bulk, loaded, release, results))
+        for _ in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    deltas = [results.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    summary = {key: sum(d[key] for d in deltas) / len(deltas) for key in ["rss", "pss", "private"]}
+    summary["pickle_loaded"] = any(d["pickle_loaded"] for d in deltas)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--bulk", action="store_true")
+    args = parser.parse_args(argv)
+
+    import forest_engine
+
+    if not forest_engine.is_exported("best_model"):
+        print(f"❌ No current export of best_model under {forest_engine.COMPILED_DIR}; "
+              "run `python -m forest_engine` first", file=sys.stderr)
+        return 1
+
+    print(f"{args.workers} workers; KB added per worker by the app's model loading and scoring")
+    print(f"{'mode':>8} {'rss':>10} {'pss':>10} {'private':>10}  pickle loaded")
+    with tempfile.TemporaryDirectory() as empty_dir:
+        for mode in MODES:
+            compiled_dir = empty_dir if mode == "pickle" else forest_engine.COMPILED_DIR
+            delta = run_mode(compiled_dir, args.workers, args.bulk)
+            print(f"{mode:>8} {delta['rss']:>10,.0f} {delta['pss']:>10,.0f} {delta['private']:>10,.0f}"
+                  f"  {'yes' if delta['pickle_loaded'] else 'no'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
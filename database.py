@@ -1,9 +1,16 @@
 import psycopg2
+from psycopg2 import sql
 from psycopg2.extras import RealDictCursor
+import datetime
+import itertools
 import os
 from dotenv import load_dotenv
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx
+import threading
 import time
+from collections import deque
+from contextlib import contextmanager
 
 # ------------------- Load .env -------------------
 dotenv_path = os.path.join(os.path.dirname(__file__), ".env")
@@ -15,39 +22,335 @@ if not DB_URL:
 else:
     print("Using DB_URL:", DB_URL)  # Debug: confirm Neon URL
 
+# Connection pool sizing; connections idle longer than DB_POOL_CHECK_AFTER
+# seconds are pinged before reuse (Neon closes idle connections)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_CHECK_AFTER = float(os.getenv("DB_POOL_CHECK_AFTER", "30"))
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+
+# Columns get_patient_records may project
+RECORD_COLUMNS = [
+    "record_id", "patient_id", "age", "gender", "bmi", "chol", "tg", "hdl", "ldl",
+    "risk_score", "risk_category", "notes", "model_version", "created_at",
+]
+
+# Fields of a save_health_records_bulk row, in order; created_at is optional
+# and defaults to the time of the insert
+BULK_RECORD_FIELDS = (
+    "patient_id", "age", "gender", "bmi", "chol", "tg", "hdl", "ldl",
+    "risk_score", "risk_category", "notes", "model_version", "created_at",
+)
+BULK_CHUNK_ROWS = int(os.getenv("BULK_CHUNK_ROWS", "50000"))
+
+# Rows per page on the admin user lists
+USER_PAGE_SIZE = int(os.getenv("USER_PAGE_SIZE", "50"))
+
+
+# ------------------- Connection Pool -------------------
+class PoolTimeout(psycopg2.OperationalError):
+    pass
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections.
+
+    getconn() hands out an idle connection, opens a new one while fewer than
+    `maxconn` exist, or waits up to `timeout` seconds for one to be returned.
+    putconn() rolls back anything left open and drops broken connections.
+    Extra keyword arguments are passed to psycopg2.connect.
+    """
+
+    def __init__(self, dsn, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT,
+                 check_after=DB_POOL_CHECK_AFTER, max_idle=DB_POOL_MAX_IDLE, **connect_kwargs):
+        self.dsn = dsn
+        self.connect_kwargs = connect_kwargs
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_after = check_after
+        self.max_idle = max_idle
+        self._idle = deque()  # (conn, returned_at), most recently returned last
+        self._open = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+            "connections_opened": 0,
+            "connections_closed": 0,
+            "health_check_failures": 0,
+        }
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._open < self.maxconn:
+                    # Reserve the slot, then connect outside the lock
+                    self._open += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(f"No database connection available within {self.timeout:g}s")
+                if not waited:
+                    waited = True
+                    self._stats["waits"] += 1
+                wait_start = time.monotonic()
+                self._cond.wait(remaining)
+                self._stats["wait_seconds"] += time.monotonic() - wait_start
+            self._stats["checkouts"] += 1
+
+        if conn is None:
+            return self._connect()
+        if conn.closed or (time.monotonic() - returned_at > self.check_after and not self._ping(conn)):
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+            with self._cond:
+                self._stats["health_check_failures"] += 1
+                self._stats["connections_closed"] += 1
+            # Reuses the dead connection's slot
+            return self._connect()
+        return conn
+
+    def putconn(self, conn):
+        if not conn.closed:
+            try:
+                status = conn.info.transaction_status
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    conn.close()
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                conn.close()
+        if conn.closed:
+            self._discard(conn)
+            return
+
+        now = time.monotonic()
+        stale = []
+        with self._cond:
+            self._idle.append((conn, now))
+            # Trim connections nobody has needed for a while, down to minconn
+            while len(self._idle) > self.minconn and now - self._idle[0][1] > self.max_idle:
+                stale.append(self._idle.popleft()[0])
+            self._cond.notify()
+        for old in stale:
+            self._discard(old)
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle),
+                **self._stats,
+            }
+
+    def _connect(self):
+        try:
+            conn = psycopg2.connect(self.dsn, **self.connect_kwargs)
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["connections_opened"] += 1
+        return conn
+
+    def _ping(self, conn):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._open -= 1
+            self._stats["connections_closed"] += 1
+            self._cond.notify()
+
+
+# Backslash escapes for COPY's text format; \N alone is NULL
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _as_int(value):
+    return None if value is None else int(value)
+
+
+def _copy_field(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, str):
+        return value.translate(_COPY_ESCAPES)
+    return str(value)
+
+
+class _CopyRowStream:
+    """File-like view of a row iterator in COPY text format, for cursor.copy_expert.
+
+    Rows are formatted as COPY asks for more data, so the text for a whole
+    chunk never exists at once. None becomes NULL and "" stays an empty
+    string.
+    """
+
+    def __init__(self, rows, rows_per_read=500):
+        self._rows = rows
+        self._rows_per_read = rows_per_read
+
+    def read(self, size=-1):
+        return "".join(
+            "\t".join(map(_copy_field, row)) + "\n"
+            for row in itertools.islice(self._rows, self._rows_per_read)
+        )
+
+
+# Streamlit re-runs app.py (and so DatabaseManager()) on every interaction;
+# the pool lives at module level so all sessions in the process share it
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_URL)
+    return _pool
+
+
+def run_concurrently(*calls):
+    """Run independent database calls at once; returns their results in order.
+
+    Each call is a zero-argument callable, usually a lambda around a
+    DatabaseManager method, and checks out its own pooled connection, so a
+    page waits about as long as its slowest query rather than the sum.
+    psycopg2 releases the GIL while waiting on the server. The first call
+    runs on the calling thread; exceptions are re-raised there.
+    """
+    results = [None] * len(calls)
+    errors = [None] * len(calls)
+
+    def run(i):
+        try:
+            results[i] = calls[i]()
+        except Exception as e:
+            errors[i] = e
+
+    # Helper threads share the script run context so st.error still reaches
+    # the page
+    threads = [
+        add_script_run_ctx(threading.Thread(target=run, args=(i,), daemon=True, name="db-query"))
+        for i in range(1, len(calls))
+    ]
+    for thread in threads:
+        thread.start()
+    if calls:
+        run(0)
+    for thread in threads:
+        thread.join()
+    for error in errors:
+        if error is not None:
+            raise error
+    return results
+
+
 # ------------------- Database Manager -------------------
 class DatabaseManager:
+    def __init__(self, pool=None):
+        self.pool = pool or get_pool()
+
+    def pool_stats(self):
+        return self.pool.stats()
     
     # ------------------- User Methods -------------------
     def create_user(self, username, email, password_hash):
-        if self.get_user_by_username(username) or self.get_user_by_email(email):
-            st.error("Username or email already exists")
-            return None
+        """Insert a user in one round trip, relying on the unique constraints.
 
+        Returns the new user_id, or None (with an error shown) if the
+        username or email is already taken.
+        """
         conn = None
         try:
-            conn = psycopg2.connect(DB_URL)
+            conn = self.pool.getconn()
             with conn.cursor() as cursor:
+                # The outer SELECT runs on the snapshot from before the
+                # INSERT, so the EXISTS checks only see pre-existing rows
                 query = """
-                    INSERT INTO users (username, email, password_hash)
-                    VALUES (%s, %s, %s)
-                    RETURNING user_id
+                    WITH inserted AS (
+                        INSERT INTO users (username, email, password_hash)
+                        VALUES (%s, %s, %s)
+                        ON CONFLICT DO NOTHING
+                        RETURNING user_id
+                    )
+                    SELECT
+                        (SELECT user_id FROM inserted),
+                        EXISTS (SELECT 1 FROM users WHERE username = %s),
+                        EXISTS (SELECT 1 FROM users WHERE email = %s)
                 """
-                cursor.execute(query, (username, email, password_hash))
-                user_id = cursor.fetchone()[0]
+                cursor.execute(query, (username, email, password_hash, username, email))
+                user_id, username_taken, email_taken = cursor.fetchone()
                 conn.commit()
-                return user_id
+                if user_id is not None:
+                    return user_id
+                if username_taken and email_taken:
+                    st.error("Username and email already exist")
+                elif username_taken:
+                    st.error("Username already exists")
+                elif email_taken:
+                    st.error("Email already exists")
+                else:
+                    # Lost a race with a concurrent sign-up that committed
+                    # after this statement's snapshot was taken
+                    st.error("Username or email already exists")
+                return None
         except Exception as e:
             st.error(f"Error creating user: {e}")
             return None
         finally:
             if conn:
-                conn.close()
+                self.pool.putconn(conn)
 
     def get_user_by_username(self, username):
         conn = None
         try:
-            conn = psycopg2.connect(DB_URL)
+            conn = self.pool.getconn()
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
                 return cursor.fetchone()
@@ -56,12 +359,47 @@ class DatabaseManager:
             return None
         finally:
             if conn:
-                conn.close()
+                self.pool.putconn(conn)
+
+    def get_session_user(self, username=None, user_id=None):
+        """The user (by username or id) with their patient ids, in one round trip.
+
+        Returns user_id, username, password_hash, is_admin, patient_id and
+        unique_id (the last two None without a patient profile), or None if
+        there is no such user.
+        """
+        key, value = ("u.username", username) if username is not None else ("u.user_id", user_id)
+        conn = None
+        try:
+            conn = self.pool.getconn()
+            # A lone SELECT needs no transaction; autocommit skips the BEGIN
+            # psycopg2 would send first and the ROLLBACK putconn would send after
+            conn.autocommit = True
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(
+                    sql.SQL("""
+                        SELECT u.user_id, u.username, u.password_hash, u.is_admin,
+                               p.patient_id, p.unique_id
+                        FROM users u
+                        LEFT JOIN patients p ON p.user_id = u.user_id
+                        WHERE {key} = %s
+                    """).format(key=sql.SQL(key)),
+                    (value,)
+                )
+                return cursor.fetchone()
+        except Exception as e:
+            st.error(f"Error fetching user: {e}")
+            return None
+        finally:
+            if conn:
+                if not conn.closed:
+                    conn.autocommit = False
+                self.pool.putconn(conn)
 
     def get_user_by_email(self, email):
         conn = None
         try:
-            conn = psycopg2.connect(DB_URL)
+            conn = self.pool.getconn()
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
                 return cursor.fetchone()
@@ -70,12 +408,12 @@ class DatabaseManager:
             return None
         finally:
             if conn:
-                conn.close()
+                self.pool.putconn(conn)
 
     def get_user_by_id(self, user_id):
         conn = None
         try:
-            conn = psycopg2.connect(DB_URL)
+            conn = self.pool.getconn()
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 cursor.execute("SELECT * FROM users WHERE user_id = %s", (user_id,))
                 return cursor.fetchone()
@@ -84,22 +422,80 @@ class DatabaseManager:
             return None
         finally:
             if conn:
-                conn.close()
+                self.pool.putconn(conn)
+
+    def search_users(self, query=None, limit=USER_PAGE_SIZE, after=None):
+        """Users whose username or email matches `query`, ordered by username.
+
+        Pass the username of the last row as `after` to fetch the next page.
+        """
+        conditions, params = self._user_filter(query)
+        if after is not None:
+            conditions.append(sql.SQL("username > %s"))
+            params.append(after)
+        where = sql.SQL(" AND ").join(conditions) if conditions else sql.SQL("TRUE")
+        conn = None
+        try:
+            conn = self.pool.getconn()
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(
+                    sql.SQL("""
+                        SELECT user_id, username, email, is_admin, created_at
+                        FROM users
+                        WHERE {where}
+                        ORDER BY username
+                        LIMIT %s
+                    """).format(where=where),
+                    params + [int(limit)]
+                )
+                return cursor.fetchall()
+        except Exception as e:
+            st.error(f"Error searching users: {e}")
+            return []
+        finally:
+            if conn:
+                self.pool.putconn(conn)
+
+    def count_users(self, query=None):
+        conditions, params = self._user_filter(query)
+        where = sql.SQL(" AND ").join(conditions) if conditions else sql.SQL("TRUE")
+        conn = None
+        try:
+            conn = self.pool.getconn()
+            with conn.cursor() as cursor:
+                cursor.execute(sql.SQL("SELECT COUNT(*) FROM users WHERE {where}").format(where=where), params)
+                return cursor.fetchone()[0]
+        except Exception as e:
+            st.error(f"Error counting users: {e}")
+            return None
+        finally:
+            if conn:
+                self.pool.putconn(conn)
+
+    @staticmethod
+    def _user_filter(query):
+        """Case-insensitive match on username or email.
+
+        Terms shorter than three characters are matched as a prefix (too short
+        for a trigram index); longer ones anywhere in the value.
+        """
+        query = (query or "").strip().lower()
+        if not query:
+            return [], []
+        escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        pattern = escaped + "%" if len(query) < 3 else "%" + escaped + "%"
+        return [sql.SQL("(lower(username) LIKE %s OR lower(email) LIKE %s)")], [pattern, pattern]
 
     def delete_user(self, user_id):
+        """Delete a user; their patient profile and health records cascade."""
         conn = None
         try:
-            conn = psycopg2.connect(DB_URL)
+            conn = self.pool.getconn()
             with conn.cursor() as cursor:
-                cursor.execute("SELECT patient_id FROM patients WHERE user_id = %s", (user_id,))
-                result = cursor.fetchone()
-                if result:
-                    patient_id = result[0]
-                    cursor.execute("DELETE FROM health_records WHERE patient_id = %s", (patient_id,))
-                    cursor.execute("DELETE FROM patients WHERE user_id = %s", (user_id,))
                 cursor.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
+                deleted = cursor.rowcount
                 conn.commit()
-                return True
+                return deleted > 0
         except Exception as e:
             st.error(f"Error deleting user: {e}")
             if conn:
@@ -107,13 +503,35 @@ class DatabaseManager:
             return False
         finally:
             if conn:
-                conn.close()
+                self.pool.putconn(conn)
+
+    def delete_users(self, user_ids):
+        """Delete many users in one transaction; returns the ids actually deleted."""
+        conn = None
+        try:
+            conn = self.pool.getconn()
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "DELETE FROM users WHERE user_id = ANY(%s) RETURNING user_id",
+                    (list(user_ids),)
+                )
+                deleted = [row[0] for row in cursor.fetchall()]
+                conn.commit()
+                return deleted
+        except Exception as e:
+            st.error(f"Error deleting users: {e}")
+            if conn:
+                conn.rollback()
+            return None
+        finally:
+            if conn:
+                self.pool.putconn(conn)
 
     # ------------------- Patient Methods -------------------
     def create_patient(self, user_id, full_name, date_of_birth, gender, contact_number):
         conn = None
         try:
-            conn = psycopg2.connect(DB_URL)
+            conn = self.pool.getconn()
             with conn.cursor() as cursor:
                 unique_id = f"PAT-{user_id}-{int(time.time())}"
                 query = """
@@ -130,12 +548,12 @@ class DatabaseManager:
             return None
         finally:
             if conn:
-                conn.close()
+                self.pool.putconn(conn)
 
     def get_patient_by_user(self, user_id):
         conn = None
         try:
-            conn = psycopg2.connect(DB_URL)
+            conn = self.pool.getconn()
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 cursor.execute("SELECT * FROM patients WHERE user_id = %s", (user_id,))
                 return cursor.fetchone()
@@ -144,12 +562,30 @@ class DatabaseManager:
             return None
         finally:
             if conn:
-                conn.close()
+                self.pool.putconn(conn)
+
+    def get_existing_patient_ids(self, patient_ids):
+        """The subset of `patient_ids` that have a patient row, or None on error."""
+        conn = None
+        try:
+            conn = self.pool.getconn()
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT patient_id FROM patients WHERE patient_id = ANY(%s)",
+                    ([int(patient_id) for patient_id in patient_ids],)
+                )
+                return {row[0] for row in cursor.fetchall()}
+        except Exception as e:
+            st.error(f"Error checking patient ids: {e}")
+            return None
+        finally:
+            if conn:
+                self.pool.putconn(conn)
 
     def update_patient(self, patient_id, full_name, date_of_birth, gender, contact_number):
         conn = None
         try:
-            conn = psycopg2.connect(DB_URL)
+            conn = self.pool.getconn()
             with conn.cursor() as cursor:
                 query = """
                     UPDATE patients
@@ -167,18 +603,18 @@ class DatabaseManager:
             return False
         finally:
             if conn:
-                conn.close()
+                self.pool.putconn(conn)
 
     # ------------------- Health Records -------------------
-    def save_health_record(self, patient_id, input_data, risk_score, risk_category, notes=None):
+    def save_health_record(self, patient_id, input_data, risk_score, risk_category, notes=None, model_version=None):
         conn = None
         try:
-            conn = psycopg2.connect(DB_URL)
+            conn = self.pool.getconn()
             with conn.cursor() as cursor:
                 query = """
                     INSERT INTO health_records
-                    (patient_id, age, gender, bmi, chol, tg, hdl, ldl, risk_score, risk_category, notes)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    (patient_id, age, gender, bmi, chol, tg, hdl, ldl, risk_score, risk_category, notes, model_version)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                     RETURNING record_id
                 """
                 cursor.execute(query, (
@@ -192,7 +628,8 @@ class DatabaseManager:
                     float(input_data['ldl']),
                     float(risk_score),
                     risk_category,
-                    notes
+                    notes,
+                    model_version
                 ))
                 record_id = cursor.fetchone()[0]
                 conn.commit()
@@ -202,23 +639,260 @@ class DatabaseManager:
             return None
         finally:
             if conn:
-                conn.close()
+                self.pool.putconn(conn)
+
+    def save_health_records_bulk(self, records, chunk_rows=BULK_CHUNK_ROWS):
+        """Insert many health records in one transaction with COPY.
 
-    def get_patient_records(self, patient_id):
+        `records` is either a DataFrame with some of BULK_RECORD_FIELDS as
+        columns (patient_id required, NaN saved as NULL), or an iterable of
+        tuples in BULK_RECORD_FIELDS order (2-D arrays work too). Rows are
+        read and copied `chunk_rows` at a time, so generators are never held
+        in memory whole. Returns the new record_ids in input order, or None
+        on error (nothing is saved).
+        """
+        record_ids = []
         conn = None
         try:
-            conn = psycopg2.connect(DB_URL)
+            columns, rows = self._bulk_rows(records)
+            copy_sql = sql.SQL("COPY health_records ({columns}) FROM STDIN").format(
+                columns=sql.SQL(", ").join(map(sql.Identifier, ["record_id"] + columns))
+            )
+            conn = self.pool.getconn()
+            with conn.cursor() as cursor:
+                while True:
+                    chunk = list(itertools.islice(rows, chunk_rows))
+                    if not chunk:
+                        break
+                    # COPY can't return the ids it generates, so take them
+                    # from the sequence first and send them with the rows
+                    cursor.execute("""
+                        SELECT array_agg(id ORDER BY id) FROM (
+                            SELECT nextval(pg_get_serial_sequence('health_records', 'record_id')) AS id
+                            FROM generate_series(1, %s)
+                        ) ids
+                    """, (len(chunk),))
+                    chunk_ids = cursor.fetchone()[0]
+                    cursor.copy_expert(
+                        copy_sql.as_string(conn),
+                        _CopyRowStream((record_id,) + tuple(row) for record_id, row in zip(chunk_ids, chunk))
+                    )
+                    record_ids += chunk_ids
+            conn.commit()
+            return record_ids
+        except Exception as e:
+            st.error(f"Error saving health records: {e}")
+            if conn:
+                conn.rollback()
+            return None
+        finally:
+            if conn:
+                self.pool.putconn(conn)
+
+    @staticmethod
+    def _bulk_rows(records):
+        """(columns, row iterator) for save_health_records_bulk."""
+        if hasattr(records, "itertuples"):
+            columns = [c for c in BULK_RECORD_FIELDS if c in records.columns]
+            if "patient_id" not in columns:
+                raise ValueError("Bulk health records need a patient_id column")
+            frame = records[columns].astype(object)
+            frame = frame.where(records[columns].notna(), None)
+            rows = frame.itertuples(index=False, name=None)
+        else:
+            rows = iter(records)
+            first = next(rows, None)
+            if first is None:
+                return list(BULK_RECORD_FIELDS), iter(())
+            if len(first) > len(BULK_RECORD_FIELDS):
+                raise ValueError(f"Bulk health records have at most {len(BULK_RECORD_FIELDS)} fields")
+            columns = list(BULK_RECORD_FIELDS[:len(first)])
+            rows = itertools.chain([first], rows)
+
+        # Float columns (a NaN in a DataFrame, any numeric array) would send
+        # patient_id/gender as "3.0", which COPY rejects for INTEGER columns
+        int_fields = [i for i, c in enumerate(columns) if c in ("patient_id", "gender")]
+
+        def with_ints(row):
+            row = list(row)
+            for i in int_fields:
+                row[i] = _as_int(row[i])
+            return row
+
+        return columns, map(with_ints, rows)
+
+    def get_patient_records(self, patient_id, start_date=None, end_date=None, columns=None,
+                            limit=None, before=None):
+        """Health records for a patient, newest first.
+
+        start_date/end_date (inclusive dates) and the keyset cursor are
+        applied in SQL. `columns` limits the projection to some of
+        RECORD_COLUMNS; created_at and record_id are always included so the
+        last row of a page can be passed back as `before=(created_at,
+        record_id)` to fetch the next one.
+        """
+        if columns is None:
+            columns = RECORD_COLUMNS
+        unknown = set(columns) - set(RECORD_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown health record columns: {sorted(unknown)}")
+        selected = ["record_id", "created_at"] + [c for c in columns if c not in ("record_id", "created_at")]
+
+        conditions, params = self._record_filters(patient_id, start_date, end_date)
+        if before is not None:
+            conditions.append(sql.SQL("(created_at, record_id) < (%s, %s)"))
+            params += list(before)
+        query = sql.SQL("""
+            SELECT {columns} FROM health_records
+            WHERE {conditions}
+            ORDER BY created_at DESC, record_id DESC
+        """).format(
+            columns=sql.SQL(", ").join(map(sql.Identifier, selected)),
+            conditions=sql.SQL(" AND ").join(conditions),
+        )
+        if limit is not None:
+            query += sql.SQL(" LIMIT %s")
+            params.append(int(limit))
+
+        conn = None
+        try:
+            conn = self.pool.getconn()
             with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                query = """
-                    SELECT * FROM health_records
-                    WHERE patient_id = %s
-                    ORDER BY created_at DESC
-                """
-                cursor.execute(query, (patient_id,))
+                cursor.execute(query, params)
                 return cursor.fetchall()
         except Exception as e:
             st.error(f"Error fetching records: {e}")
             return None
         finally:
             if conn:
-                conn.close()
+                self.pool.putconn(conn)
+
+    def get_patient_record_summary(self, patient_id, start_date=None, end_date=None):
+        """First and last record time overall, and the number of records in the range."""
+        conditions, params = self._record_filters(None, start_date, end_date)
+        in_range = sql.SQL(" AND ").join(conditions) if conditions else sql.SQL("TRUE")
+        query = sql.SQL("""
+            SELECT MIN(created_at) AS first_at,
+                   MAX(created_at) AS last_at,
+                   COUNT(*) FILTER (WHERE {in_range}) AS count
+            FROM health_records
+            WHERE patient_id = %s
+        """).format(in_range=in_range)
+
+        conn = None
+        try:
+            conn = self.pool.getconn()
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(query, params + [patient_id])
+                return cursor.fetchone()
+        except Exception as e:
+            st.error(f"Error summarising records: {e}")
+            return None
+        finally:
+            if conn:
+                self.pool.putconn(conn)
+
+    def get_risk_trend(self, patient_id, start_date=None, end_date=None, bucket="day"):
+        """Min/mean/max risk score per day, week or month, oldest first."""
+        if bucket not in ("day", "week", "month"):
+            raise ValueError(f"Unknown trend bucket: {bucket}")
+        conditions, params = self._record_filters(patient_id, start_date, end_date)
+        query = sql.SQL("""
+            SELECT date_trunc(%s, created_at) AS bucket,
+                   MIN(risk_score) AS min_risk,
+                   AVG(risk_score) AS mean_risk,
+                   MAX(risk_score) AS max_risk,
+                   COUNT(*) AS count
+            FROM health_records
+            WHERE {conditions}
+            GROUP BY 1
+            ORDER BY 1
+        """).format(conditions=sql.SQL(" AND ").join(conditions))
+
+        conn = None
+        try:
+            conn = self.pool.getconn()
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(query, [bucket] + params)
+                return cursor.fetchall()
+        except Exception as e:
+            st.error(f"Error fetching risk trend: {e}")
+            return None
+        finally:
+            if conn:
+                self.pool.putconn(conn)
+
+    @staticmethod
+    def _record_filters(patient_id, start_date, end_date):
+        conditions, params = [], []
+        if patient_id is not None:
+            conditions.append(sql.SQL("patient_id = %s"))
+            params.append(patient_id)
+        # Half-open range on the raw column so the index can be used
+        if start_date is not None:
+            conditions.append(sql.SQL("created_at >= %s"))
+            params.append(start_date)
+        if end_date is not None:
+            conditions.append(sql.SQL("created_at < %s"))
+            params.append(end_date + datetime.timedelta(days=1))
+        return conditions, params
+
+    # ------------------- Admin Statistics -------------------
+    def get_admin_stats(self, days=14):
+        """Dashboard counters from the trigger-maintained summary tables.
+
+        Sums the sharded totals rows and the shards of at most `days` daily
+        rows, however many users and health records there are.
+        """
+        conn = None
+        try:
+            conn = self.pool.getconn()
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT COALESCE(SUM(users), 0)::bigint AS users,
+                           COALESCE(SUM(assessments), 0)::bigint AS assessments,
+                           COALESCE(SUM(high_risk), 0)::bigint AS high_risk
+                    FROM admin_stats_totals
+                """)
+                totals = cursor.fetchone()
+                cursor.execute("""
+                    SELECT day,
+                           SUM(assessments)::bigint AS assessments,
+                           SUM(high_risk)::bigint AS high_risk,
+                           SUM(active_users)::bigint AS active_users,
+                           SUM(new_users)::bigint AS new_users
+                    FROM admin_daily_stats
+                    WHERE day > CURRENT_DATE - %s
+                    GROUP BY day
+                    ORDER BY day DESC
+                """, (days,))
+                daily = cursor.fetchall()
+                cursor.execute("SELECT CURRENT_DATE AS today")
+                today = cursor.fetchone()['today']
+        except Exception as e:
+            st.error(f"Error fetching admin statistics: {e}")
+            return None
+        finally:
+            if conn:
+                self.pool.putconn(conn)
+
+        if totals is None:
+            return None
+        current = next((row for row in daily if row['day'] == today), None)
+        return {
+            "total_users": totals['users'],
+            "total_assessments": totals['assessments'],
+            "high_risk_share": totals['high_risk'] / totals['assessments'] if totals['assessments'] else None,
+            "assessments_today": current['assessments'] if current else 0,
+            "active_today": current['active_users'] if current else 0,
+            "recent_activity": [
+                {
+                    "Date": row['day'],
+                    "Assessments": row['assessments'],
+                    "High Risk": row['high_risk'],
+                    "Active Users": row['active_users'],
+                    "New Users": row['new_users'],
+                }
+                for row in daily
+            ],
+        }
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+import model_registry
+from prediction import feature_names, to_feature_matrix, validate_inputs
+
+# ------------------- Load .env -------------------
+dotenv_path = os.path.join(os.path.dirname(__file__), ".env")
+load_dotenv(dotenv_path)
+
+ENSEMBLE_MEMBERS = ["random_forest", "xgboost", "svm", "logistic_regression"]
+ENSEMBLE_METHOD = os.getenv("ENSEMBLE_METHOD", "mean")
+ENSEMBLE_LATENCY_BUDGET_MS = float(os.getenv("ENSEMBLE_LATENCY_BUDGET_MS", "200"))
+# e.g. {"random_forest": 2, "xgboost": 2, "svm": 1, "logistic_regression": 1}
+ENSEMBLE_WEIGHTS = json.loads(os.getenv("ENSEMBLE_WEIGHTS", "{}"))
+# Logistic meta-learner over member logits:
+# {"intercept": 0.0, "coef": {"random_forest": 1.2, ...}}
+ENSEMBLE_STACKING = json.loads(os.getenv("ENSEMBLE_STACKING", "{}"))
+
+# Calls per member allowed to run at once, across every session in the
+# process. A member already at the limit (e.g. still working on calls that
+# blew their budget) is skipped as "busy" instead of queueing.
+ENSEMBLE_MAX_IN_FLIGHT = int(os.getenv("ENSEMBLE_MAX_IN_FLIGHT", "4"))
+
+METHODS = ["mean", "weighted", "stacked"]
+
+# Shared by every session in the process, with a thread for every call the
+# in-flight limit admits, so an admitted call never waits for a thread
+_executor = ThreadPoolExecutor(
+    max_workers=len(ENSEMBLE_MEMBERS) * ENSEMBLE_MAX_IN_FLIGHT, thread_name_prefix="ensemble"
+)
+_in_flight = Counter()
+_in_flight_lock = threading.Lock()
+
+
+def member_proba(name, X_scaled):
+    """P(high risk) for each row from one member model."""
+    return member_proba_versioned(name, X_scaled)[0]
+
+
+def member_proba_versioned(name, X_scaled):
+    """(P(high risk) per row, version of the artifact that produced it)."""
+    model, version = model_registry.load_versioned(name)
+    if hasattr(model, "predict_proba") and getattr(model, "probability", True):
+        return model.predict_proba(X_scaled)[:, 1], version
+    # The shipped SVC was fitted without probability=True, so squash its
+    # decision function onto (0, 1) instead
+    return 1.0 / (1.0 + np.exp(-model.decision_function(X_scaled))), version
+
+
+def _admit(name):
+    with _in_flight_lock:
+        if _in_flight[name] >= ENSEMBLE_MAX_IN_FLIGHT:
+            return False
+        _in_flight[name] += 1
+        return True
+
+
+def _timed_member(name, X_scaled):
+    try:
+        start = time.perf_counter()
+        proba, version = member_proba_versioned(name, X_scaled)
+        return proba, version, (time.perf_counter() - start) * 1000
+    finally:
+        with _in_flight_lock:
+            _in_flight[name] -= 1
+
+
+def method_fallback(method, weights=None, stacking=None):
+    """Why `method` can't be used as configured, or None if it can.
+
+    predict_ensemble then combines with the next method down instead.
+    """
+    weights = ENSEMBLE_WEIGHTS if weights is None else weights
+    stacking = ENSEMBLE_STACKING if stacking is None else stacking
+    if method == "stacked" and not stacking.get("coef"):
+        return "no meta-learner coefficients are configured (ENSEMBLE_STACKING)"
+    if method == "weighted" and not sum(float(w) for w in weights.values()) > 0:
+        return "no member weights are configured (ENSEMBLE_WEIGHTS)"
+    return None
+
+
+def predict_ensemble(rows, method=None, weights=None, budget_ms=None, members=None, stacking=None):
+    """Score `rows` against every member model concurrently.
+
+    Members that have not answered within `budget_ms` are left out and the
+    probabilities are combined from whichever members did finish (or, if
+    none did, from the first one to finish after the deadline). Returns a
+    dict with the combined P(high risk) per row, the method actually used,
+    per-member status and latency, and the artifact version of each member
+    that answered (see version_tag).
+    """
+    method = method or ENSEMBLE_METHOD
+    if method not in METHODS:
+        raise ValueError(f"Unknown ensemble method: {method}")
+    weights = ENSEMBLE_WEIGHTS if weights is None else weights
+    stacking = ENSEMBLE_STACKING if stacking is None else stacking
+    budget_ms = ENSEMBLE_LATENCY_BUDGET_MS if budget_ms is None else budget_ms
+    members = members or ENSEMBLE_MEMBERS
+
+    # Deserializing happens once per process and is not charged to the budget
+    results = {}
+    for name in members:
+        try:
+            model_registry.load_model(name)
+        except Exception as e:
+            results[name] = {"status": "error", "latency_ms": None, "probability": None, "error": str(e)}
+    members = [name for name in members if name not in results]
+
+    start = time.perf_counter()
+    X = validate_inputs(to_feature_matrix(rows))
+    scaler = model_registry.load_model("scaler")
+    X_scaled = scaler.transform(pd.DataFrame(X, columns=feature_names))
+
+    futures = {}
+    for name in members:
+        if _admit(name):
+            futures[_executor.submit(_timed_member, name, X_scaled)] = name
+        else:
+            results[name] = {"status": "busy", "latency_ms": None, "probability": None}
+    remaining = max(budget_ms / 1000 - (time.perf_counter() - start), 0)
+    done, _ = wait(futures, timeout=remaining)
+    budget_exceeded = not done
+    if budget_exceeded and futures:
+        # Nothing beat the deadline; answer with the first member to finish
+        # rather than failing the request
+        wait(futures, return_when=FIRST_COMPLETED)
+
+    available = {}
+    versions = {}
+    for future, name in futures.items():
+        if not future.done():
+            # Left to finish in the background; its answer is discarded
+            results[name] = {"status": "timeout", "latency_ms": None, "probability": None}
+            continue
+        try:
+            proba, version, latency_ms = future.result()
+        except Exception as e:
+            results[name] = {"status": "error", "latency_ms": None, "probability": None, "error": str(e)}
+            continue
+        available[name] = proba
+        versions[name] = version
+        results[name] = {
+            "status": "ok",
+            "latency_ms": latency_ms,
+            "probability": proba.tolist() if len(proba) > 1 else float(proba[0]),
+        }
+
+    if not available:
+        raise RuntimeError("No ensemble member could score the input")
+
+    probability, method_used = _combine(available, method, weights, stacking)
+    fallback_reason = method_fallback(method, weights, stacking)
+    if method_used != method and fallback_reason is None:
+        fallback_reason = "a member it needs did not answer in time"
+    return {
+        "probability": probability,
+        "method": method,
+        "method_used": method_used,
+        "fallback_reason": fallback_reason if method_used != method else None,
+        "members": results,
+        "versions": versions,
+        "latency_ms": (time.perf_counter() - start) * 1000,
+        "budget_ms": budget_ms,
+        "budget_exceeded": budget_exceeded,
+    }
+
+
+def version_tag(result):
+    """Compact model_version for a predict_ensemble result.
+
+    "ensemble:<method used>:<hash>", the hash taken over the sorted
+    name=version pairs of the members that answered, so a saved score can
+    be traced back to the artifacts behind it.
+    """
+    pairs = ",".join(f"{name}={version}" for name, version in sorted(result["versions"].items()))
+    digest = hashlib.sha256(pairs.encode()).hexdigest()[:12]
+    return f"ensemble:{result['method_used']}:{digest}"
+
+
+def _combine(available, method, weights, stacking):
+    names = list(available)
+    P = np.vstack([available[name] for name in names])
+
+    if method == "stacked":
+        coef = stacking.get("coef", {})
+        if coef and all(name in available for name in coef):
+            # The meta-learner was fitted on all of its inputs, so it can only
+            # be applied when none of them missed the deadline
+            logits = np.log(np.clip(P, 1e-9, 1 - 1e-9) / np.clip(1 - P, 1e-9, 1))
+            z = stacking.get("intercept", 0.0) + sum(
+                coef[name] * logits[names.index(name)] for name in coef
+            )
+            return 1.0 / (1.0 + np.exp(-z)), "stacked"
+        method = "weighted" if weights else "mean"
+
+    if method == "weighted":
+        w = np.array([float(weights.get(name, 0.0)) for name in names])
+        if w.sum() > 0:
+            return (w[:, np.newaxis] * P).sum(axis=0) / w.sum(), "weighted"
+
+    return P.mean(axis=0), "mean"
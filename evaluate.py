@@ -0,0 +1,263 @@
+"""Held-out evaluation of every shipped model.
+
+Usage (from the repo root):
+    python -m evaluate [holdout.csv] [--workers N] [--output metrics.json]
+
+The CSV needs the seven feature columns plus TARGET_COLUMN (default
+"target"); it defaults to REFERENCE_DATA_CSV. Rows are parsed once and
+shared with the worker processes as a memory-mapped array, then every
+(model, row shard) pair is scored in parallel. Accuracy, precision, recall,
+F1, specificity, ROC AUC, average precision, the ROC and PR curves and the
+confusion matrix all come from a single sort of each model's scores. The
+result is written to ARTIFACTS_DIR/evaluation/metrics.json, which the Model
+Information page reads.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import model_registry
+from ensemble import member_proba
+from prediction import feature_names, frame_to_features, valid_row_mask
+
+EVALUATION_DIR = os.path.join(model_registry.ARTIFACTS_DIR, "evaluation")
+METRICS_PATH = os.path.join(EVALUATION_DIR, "metrics.json")
+EVALUATED_MODELS = ["best_model", "random_forest", "xgboost", "svm", "logistic_regression"]
+MODEL_LABELS = {
+    "best_model": "Deployed model",
+    "random_forest": "Random Forest",
+    "xgboost": "XGBoost",
+    "svm": "SVM",
+    "logistic_regression": "Logistic Regression",
+}
+# Matches the "High Risk" cut-off used on the risk page
+THRESHOLD = 0.5
+SHARD_ROWS = 131072
+# Rows of each shard also scored by sklearn to check rbf_decision_function
+GAMMA_PROBE_ROWS = 64
+CURVE_POINTS = 200
+
+_shared = {}
+
+
+def _init_worker(X_path):
+    _shared["X"] = np.load(X_path, mmap_mode="r")
+
+
+def score_shard(name, start, stop):
+    model = model_registry.load_model(name)
+    X = np.asarray(_shared["X"][start:stop])
+    X_scaled = model_registry.load_model("scaler").transform(pd.DataFrame(X, columns=feature_names))
+    if getattr(model, "kernel", None) == "rbf" and not getattr(model, "probability", True):
+        gamma = resolved_gamma(model)
+        probe = X_scaled[:GAMMA_PROBE_ROWS]
+        if np.allclose(rbf_decision_function(model, probe, gamma), model.decision_function(probe), rtol=0, atol=1e-9):
+            decision = rbf_decision_function(model, X_scaled, gamma)
+        else:
+            # gamma didn't resolve to what the model was fitted with
+            decision = model.decision_function(X_scaled)
+        return name, start, 1.0 / (1.0 + np.exp(-decision))
+    return name, start, member_proba(name, X_scaled)
+
+
+def resolved_gamma(model):
+    """The RBF gamma an SVC was fitted with, from its public parameters.
+
+    "auto" is 1 / n_features. "scale" is 1 / (n_features * X.var()) over the
+    training data, which the model doesn't keep; every model here is fitted
+    on the StandardScaler's output, whose overall variance is 1, so it is
+    taken as 1 / n_features too. score_shard checks the result against
+    sklearn before relying on it.
+    """
+    gamma = model.get_params()["gamma"]
+    if gamma in ("scale", "auto"):
+        return 1.0 / model.n_features_in_
+    return float(gamma)
+
+
+def rbf_decision_function(model, X_scaled, gamma=None, batch_rows=8192):
+    """SVC.decision_function for a binary RBF model as blocked matrix products.
+
+    libsvm evaluates the kernel one support vector at a time; expanding
+    ||x - sv||^2 lets BLAS do the work. Agrees with sklearn to ~1e-12.
+    """
+    gamma = resolved_gamma(model) if gamma is None else gamma
+    sv = model.support_vectors_
+    coef = model.dual_coef_[0]
+    sv_norms = (sv * sv).sum(axis=1)
+    out = np.empty(len(X_scaled))
+    for start in range(0, len(X_scaled), batch_rows):
+        x = np.asarray(X_scaled[start:start + batch_rows], dtype=np.float64)
+        sq_dist = (x * x).sum(axis=1)[:, np.newaxis] + sv_norms - 2.0 * (x @ sv.T)
+        np.maximum(sq_dist, 0.0, out=sq_dist)
+        out[start:start + len(x)] = np.exp(-gamma * sq_dist) @ coef + model.intercept_[0]
+    return out
+
+
+def _downsample(*curves):
+    n = len(curves[0])
+    if n <= CURVE_POINTS:
+        return [c.tolist() for c in curves]
+    index = np.unique(np.linspace(0, n - 1, CURVE_POINTS).round().astype(int))
+    return [c[index].tolist() for c in curves]
+
+
+def binary_metrics(y, proba, threshold=THRESHOLD):
+    """Every reported metric from one descending sort of the scores.
+
+    Returns None when there are no rows to score.
+    """
+    y = np.asarray(y, dtype=bool)
+    if len(y) == 0:
+        return None
+    proba = np.asarray(proba, dtype=np.float64)
+    order = np.argsort(-proba, kind="stable")
+    sorted_proba = proba[order]
+    tps = np.cumsum(y[order], dtype=np.int64)
+    fps = np.arange(1, len(y) + 1) - tps
+    positives, negatives = int(tps[-1]), int(fps[-1])
+
+    # Confusion matrix: rows with proba > threshold are predicted positive
+    n_predicted = int(np.searchsorted(-sorted_proba, -threshold, side="left"))
+    tp = int(tps[n_predicted - 1]) if n_predicted else 0
+    fp = n_predicted - tp
+    fn, tn = positives - tp, negatives - fp
+
+    # One curve point per distinct score
+    distinct = np.r_[np.flatnonzero(np.diff(sorted_proba)), len(y) - 1]
+    tp_at, fp_at = tps[distinct], fps[distinct]
+    tpr = np.r_[0.0, tp_at / positives] if positives else np.zeros(len(distinct) + 1)
+    fpr = np.r_[0.0, fp_at / negatives] if negatives else np.zeros(len(distinct) + 1)
+    precision_at = tp_at / (tp_at + fp_at)
+    recall_at = tpr[1:]
+
+    roc_fpr, roc_tpr = _downsample(fpr, tpr)
+    pr_recall, pr_precision = _downsample(np.r_[0.0, recall_at], np.r_[1.0, precision_at])
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / positives if positives else 0.0
+    return {
+        "rows": int(len(y)),
+        "positives": positives,
+        "threshold": threshold,
+        "accuracy": (tp + tn) / len(y),
+        "precision": precision,
+        "recall": recall,
+        "specificity": tn / negatives if negatives else 0.0,
+        "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "roc_auc": float(np.trapezoid(tpr, fpr)) if positives and negatives else None,
+        "average_precision": float(np.sum(np.diff(np.r_[0.0, recall_at]) * precision_at)) if positives else None,
+        "confusion": {"tn": tn, "fp": fp, "fn": fn, "tp": tp},
+        "roc": {"fpr": roc_fpr, "tpr": roc_tpr},
+        "pr": {"recall": pr_recall, "precision": pr_precision},
+    }
+
+
+def evaluate(data_path, models=None, workers=None, log=None):
+    models = models or EVALUATED_MODELS
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+
+    df = pd.read_csv(data_path)
+    if model_registry.TARGET_COLUMN not in df.columns:
+        raise ValueError(f"{data_path} has no '{model_registry.TARGET_COLUMN}' column")
+    X = frame_to_features(df)
+    valid = valid_row_mask(X) & df[model_registry.TARGET_COLUMN].notna().to_numpy()
+    X = X[valid]
+    y = df[model_registry.TARGET_COLUMN].to_numpy()[valid].astype(int)
+    if len(X) == 0:
+        raise ValueError(f"{data_path} has no rows with valid features and a target")
+    if log:
+        log(f"{len(X):,} valid rows of {len(df):,} loaded in {time.perf_counter() - start:.1f}s")
+
+    # Identical pickles (e.g. best_model is a copy of random_forest) are
+    # scored once
+    versions = {name: model_registry.model_version(name) for name in models}
+    unique = {}
+    for name in models:
+        unique.setdefault(versions[name], name)
+    scored = list(unique.values())
+
+    proba = {name: np.empty(len(X)) for name in scored}
+    with tempfile.TemporaryDirectory() as tmp:
+        X_path = os.path.join(tmp, "X.npy")
+        np.save(X_path, X)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X_path,)) as executor:
+            futures = [
+                executor.submit(score_shard, name, lo, min(lo + SHARD_ROWS, len(X)))
+                for name in scored
+                for lo in range(0, len(X), SHARD_ROWS)
+            ]
+            for future in futures:
+                name, lo, shard_proba = future.result()
+                proba[name][lo:lo + len(shard_proba)] = shard_proba
+    if log:
+        log(f"Scored {len(scored)} distinct models in {time.perf_counter() - start:.1f}s")
+
+    results = {}
+    for name in models:
+        results[name] = binary_metrics(y, proba[unique[versions[name]]])
+        results[name]["model_version"] = versions[name]
+    return {
+        "data": os.path.basename(data_path),
+        "data_hash": model_registry.cached_file_hash(data_path)[:12],
+        "target_column": model_registry.TARGET_COLUMN,
+        "computed_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "seconds": time.perf_counter() - start,
+        "models": results,
+    }
+
+
+def save_metrics(report, path=METRICS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_metrics(path=METRICS_PATH):
+    """The last evaluation report, or None if the job has not been run."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate every shipped model on a held-out CSV.")
+    parser.add_argument("data", nargs="?", default=model_registry.REFERENCE_DATA_CSV,
+                        help="Labelled CSV (default: REFERENCE_DATA_CSV)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--output", default=METRICS_PATH)
+    args = parser.parse_args(argv)
+
+    if not args.data:
+        print("❌ Pass a CSV or set REFERENCE_DATA_CSV", file=sys.stderr)
+        return 1
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    try:
+        report = evaluate(args.data, workers=args.workers, log=log)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    save_metrics(report, args.output)
+    for name, m in report["models"].items():
+        print(f"{name:>20}  acc {m['accuracy']:.3f}  f1 {m['f1']:.3f}  auc {m['roc_auc'] or float('nan'):.3f}")
+    print(f"✅ Wrote {args.output} in {report['seconds']:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""Exact per-patient feature attributions for the random forest (TreeSHAP).
+
+Path-dependent TreeSHAP reduces, leaf by leaf, to a small product game:
+reaching leaf L with features S fixed to the patient's values happens with
+weight prod_{j in S} o_j * prod_{j not in S} z_j, where z_j is the product
+of cover fractions along L's path for splits on feature j and o_j is 1 when
+the patient satisfies every one of those splits. The Shapley value of that
+game for feature i is
+
+    v_L * (o_i - z_i) * sum_k c_k * k! (M - 1 - k)! / M!
+
+with c_k the coefficients of prod_{j != i} (z_j + o_j t) -- polynomial in
+the number of features. Features a path never splits on get z = o = 1,
+which makes them null players, so every leaf can be padded to all M = 7
+features. Because o is binary there are only 2^M patterns per leaf, so the
+attributions for every (leaf, pattern) are precomputed once per model and
+explaining a batch is a vectorised table lookup.
+
+The table is built from forest_engine's flattened arrays and is written
+into the same export, so workers map it rather than each building their own.
+"""
+import logging
+import math
+import threading
+
+import numpy as np
+from scipy import sparse
+
+import forest_engine
+import model_registry
+
+logger = logging.getLogger(__name__)
+
+# Rows explained per pass; bounds the (rows x leaves) scratch arrays
+BATCH_ROWS = 512
+
+_tables = {}
+_tables_lock = threading.Lock()
+_warming = set()
+
+
+def export_tree_paths(compiled):
+    """Feature intervals, cover fractions and P(high risk) of every leaf.
+
+    `compiled` is forest_engine.export_forest output, where leaves point at
+    themselves and `value` is already normalised per node.
+    """
+    feature, threshold = compiled["feature"], compiled["threshold"]
+    left, right = compiled["left"], compiled["right"]
+    cover, positive = compiled["cover"], compiled["value"][:, 1]
+    n_features = int(compiled["n_features"])
+
+    lo, hi, zfrac, value = [], [], [], []
+    for root in compiled["roots"]:
+        # Iterative DFS carrying the feature intervals and cover fractions
+        stack = [(int(root), np.full(n_features, -np.inf), np.full(n_features, np.inf), np.ones(n_features))]
+        while stack:
+            node, node_lo, node_hi, node_z = stack.pop()
+            node_left, node_right = left[node], right[node]
+            if node_left == node:
+                lo.append(node_lo)
+                hi.append(node_hi)
+                zfrac.append(node_z)
+                value.append(positive[node])
+                continue
+            f, thr = feature[node], threshold[node]
+
+            left_hi, left_z = node_hi.copy(), node_z.copy()
+            left_hi[f] = min(left_hi[f], thr)
+            left_z[f] *= cover[node_left] / cover[node]
+            stack.append((node_left, node_lo, left_hi, left_z))
+
+            right_lo, right_z = node_lo.copy(), node_z.copy()
+            right_lo[f] = max(right_lo[f], thr)
+            right_z[f] *= cover[node_right] / cover[node]
+            stack.append((node_right, right_lo, node_hi, right_z))
+
+    return {
+        "lo": np.array(lo),
+        "hi": np.array(hi),
+        "z": np.array(zfrac),
+        "value": np.array(value),
+        "n_trees": len(compiled["roots"]),
+    }
+
+
+def build_table(paths):
+    """Attribution of every leaf to every feature for each of the 2^M hot patterns."""
+    z, value, n_trees = paths["z"], paths["value"], paths["n_trees"]
+    n_leaves, M = z.shape
+    n_patterns = 2 ** M
+    hot = ((np.arange(n_patterns)[:, np.newaxis] >> np.arange(M)) & 1).astype(bool)
+    shapley_weights = np.array(
+        [math.factorial(k) * math.factorial(M - 1 - k) / math.factorial(M) for k in range(M)]
+    )
+
+    # Coefficients of prod_j (z_j + o_j t), shape (degree, leaves, patterns)
+    full = np.zeros((M + 1, n_leaves, n_patterns))
+    full[0] = 1.0
+    for j in range(M):
+        zj = z[:, j][:, np.newaxis]
+        oj = hot[:, j][np.newaxis, :]
+        full[1:] = full[1:] * zj + full[:-1] * oj
+        full[0] = full[0] * zj
+
+    table = np.empty((n_leaves, n_patterns, M))
+    for i in range(M):
+        zi = z[:, i][:, np.newaxis]
+        oi = hot[:, i][np.newaxis, :]
+        # Divide feature i's factor back out. For o_i = 0 it is the constant
+        # z_i > 0; for o_i = 1 it is (z_i + t), done by synthetic division
+        # from the top coefficient down, which is stable because z_i <= 1
+        quotient = np.empty((M, n_leaves, n_patterns))
+        quotient[M - 1] = full[M]
+        for k in range(M - 1, 0, -1):
+            quotient[k - 1] = full[k] - zi * quotient[k]
+        quotient = np.where(oi, quotient, full[:M] / zi)
+        weight = np.tensordot(shapley_weights, quotient, axes=1)
+        table[:, :, i] = (oi - zi) * weight
+
+    table *= (value / n_trees)[:, np.newaxis, np.newaxis]
+    expected_value = float((value * z.prod(axis=1)).sum() / n_trees)
+    return {
+        "lo": np.ascontiguousarray(paths["lo"].T),
+        "hi": np.ascontiguousarray(paths["hi"].T),
+        "table": table.reshape(n_leaves * n_patterns, M),
+        "n_leaves": n_leaves,
+        "n_patterns": n_patterns,
+        "expected_value": expected_value,
+    }
+
+
+def shap_values(explainer, X_scaled):
+    """Per-feature contributions to P(high risk) for already-scaled rows.
+
+    Each row's contributions plus `expected_value` equal the forest's
+    predicted probability for that row.
+    """
+    # Same float32 view of the features the trees compare against
+    X = np.asarray(X_scaled, dtype=np.float32).astype(np.float64)
+    lo, hi, table = explainer["lo"], explainer["hi"], explainer["table"]
+    n_leaves, n_patterns = explainer["n_leaves"], explainer["n_patterns"]
+    leaf_offsets = np.arange(n_leaves, dtype=np.int64) * n_patterns
+
+    out = np.empty(X.shape)
+    for start in range(0, len(X), BATCH_ROWS):
+        chunk = X[start:start + BATCH_ROWS]
+        n = len(chunk)
+        index = np.tile(leaf_offsets, (n, 1))
+        for j in range(chunk.shape[1]):
+            x = chunk[:, j][:, np.newaxis]
+            index += ((x > lo[j]) & (x <= hi[j])).astype(np.int64) << j
+        # One (leaf, pattern) row per leaf per patient: summing the selected
+        # table rows is a sparse one-hot matrix times the table
+        selector = sparse.csr_matrix(
+            (np.ones(index.size), index.ravel(), np.arange(0, index.size + 1, n_leaves)),
+            shape=(n, len(table)),
+        )
+        out[start:start + n] = selector @ table
+    return out
+
+
+def table_arrays(compiled):
+    """The explainer for `compiled` as plain arrays, for forest_engine's export."""
+    explainer = build_table(export_tree_paths(compiled))
+    return {
+        "explain_lo": explainer["lo"],
+        "explain_hi": explainer["hi"],
+        "explain_table": explainer["table"],
+        "explain_expected_value": np.float64(explainer["expected_value"]),
+    }
+
+
+def get_explainer(name="best_model"):
+    """Attribution table for registry model `name`, built once per version."""
+    compiled, (version, _) = forest_engine.get_compiled_versioned(name)
+    return prepare(name, compiled, version)
+
+
+def prepare(name, compiled, version):
+    """Build (or fetch) the table for compiled arrays of a specific model version.
+
+    Exported arrays already carry the table and are just wrapped. The
+    hot-reload watcher calls this before swapping a new model in, so the
+    first explanation after the swap does not pay for the build.
+    """
+    key = (name, version)
+    explainer = _tables.get(key)
+    if explainer is None:
+        with _tables_lock:
+            explainer = _tables.get(key)
+            if explainer is None:
+                if "explain_table" in compiled:
+                    explainer = {
+                        "lo": compiled["explain_lo"],
+                        "hi": compiled["explain_hi"],
+                        "table": compiled["explain_table"],
+                        "n_leaves": compiled["explain_lo"].shape[1],
+                        "n_patterns": len(compiled["explain_table"]) // compiled["explain_lo"].shape[1],
+                        "expected_value": float(compiled["explain_expected_value"]),
+                    }
+                else:
+                    explainer = build_table(export_tree_paths(compiled))
+                # Keep only this table and the one for the model currently
+                # being served (they differ while a reload is being prepared)
+                keep = {version, model_registry.model_version(name)}
+                for stale in [k for k in _tables if k[0] == name and k[1] not in keep]:
+                    del _tables[stale]
+                _tables[key] = explainer
+    return explainer
+
+
+def warm_in_background(name="best_model"):
+    """Build the table on a daemon thread so the first explanation is instant.
+
+    Safe to call on every Streamlit rerun; only the first call per process
+    (and model version) starts a thread.
+    """
+    key = (name, model_registry.model_version(name))
+    with _tables_lock:
+        if key in _tables or key in _warming:
+            return
+        _warming.add(key)
+    threading.Thread(target=_warm, args=(name,), daemon=True, name="explain-warmup").start()
+
+
+def _warm(name):
+    # A model explanations can't handle is reported when one is requested;
+    # here it only means there is nothing to warm
+    try:
+        get_explainer(name)
+    except Exception:
+        logger.warning("Could not build the attribution table for %s", name, exc_info=True)
@@ -0,0 +1,299 @@
+"""Pure-NumPy evaluator for the random forest models.
+
+`export_forest` flattens every fitted tree of a RandomForestClassifier (and
+the StandardScaler in front of it) into a handful of contiguous arrays, and
+`predict_proba` walks all trees for a whole batch at once. The arithmetic
+mirrors sklearn step for step (float64 scaling, float32 feature cast,
+per-tree normalisation, sequential accumulation), so probabilities match
+`forest.predict_proba(scaler.transform(X))` exactly.
+
+Run `python -m forest_engine` to export the forests (and their attribution
+tables, see explain.py) to COMPILED_DIR. Workers then map them with
+mmap_mode="r" and share the pages, and never unpickle the forest unless a
+batch is large enough to go to sklearn.
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+import model_registry
+
+# Rows evaluated per pass; bounds the (n_trees x rows) node-index scratch array
+BATCH_ROWS = 8192
+
+# Exported arrays live here as plain .npy files so every worker process can
+# memory-map the same physical pages instead of holding a private copy
+COMPILED_DIR = os.getenv("COMPILED_DIR") or os.path.join(model_registry.MODEL_DIR, "compiled")
+# xgboost's booster is an opaque blob that xgboost parses into its own C++
+# structures, so there are no arrays to export; it always loads its pickle
+MMAP_MODELS = ["best_model", "random_forest"]
+# Bumped whenever the set or layout of exported arrays changes
+EXPORT_FORMAT = 2
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+# (name, model_version) pairs served from the export, and ones that can't be compiled
+_exported = set()
+_unsupported = set()
+
+
+def is_supported(model):
+    return hasattr(model, "estimators_") and all(hasattr(est, "tree_") for est in model.estimators_)
+
+
+def export_forest(forest, scaler=None):
+    trees = [est.tree_ for est in forest.estimators_]
+    sizes = np.array([tree.node_count for tree in trees])
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+    n_classes = len(forest.classes_)
+
+    feature, threshold, left, right, value, cover = [], [], [], [], [], []
+    for tree, offset in zip(trees, offsets):
+        node_ids = np.arange(tree.node_count, dtype=np.int64) + offset
+        is_leaf = tree.children_left == -1
+        # Leaves point at themselves so every tree can be stepped the same
+        # number of times regardless of its depth
+        feature.append(np.where(is_leaf, 0, tree.feature).astype(np.int64))
+        threshold.append(tree.threshold.astype(np.float64))
+        left.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+        right.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+
+        proba = tree.value[:, 0, :n_classes].astype(np.float64)
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        value.append(proba / normalizer)
+        cover.append(tree.weighted_n_node_samples.astype(np.float64))
+
+    compiled = {
+        "feature": np.concatenate(feature),
+        "threshold": np.concatenate(threshold),
+        "left": np.concatenate(left),
+        "right": np.concatenate(right),
+        "value": np.concatenate(value),
+        "cover": np.concatenate(cover),
+        "roots": offsets,
+        "max_depth": np.int64(max(tree.max_depth for tree in trees)),
+        "n_features": np.int64(forest.n_features_in_),
+        "classes": np.asarray(forest.classes_),
+    }
+    return compiled if scaler is None else with_scaler(compiled, scaler)
+
+
+def with_scaler(compiled, scaler):
+    """`compiled` with `scaler`'s parameters in front of the trees.
+
+    Exports hold the forest alone, so a new scaler doesn't invalidate them.
+    """
+    return dict(
+        compiled,
+        scaler_mean=np.asarray(scaler.mean_, dtype=np.float64),
+        scaler_scale=np.asarray(scaler.scale_, dtype=np.float64),
+    )
+
+
+def predict_proba(compiled, X):
+    """Class probabilities for raw (unscaled) feature rows."""
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim == 1:
+        X = X[np.newaxis, :]
+    if len(X) <= BATCH_ROWS:
+        return _predict_chunk(compiled, X)
+    return np.concatenate([
+        _predict_chunk(compiled, X[start:start + BATCH_ROWS])
+        for start in range(0, len(X), BATCH_ROWS)
+    ])
+
+
+def _predict_chunk(compiled, X):
+    Xs = (X - compiled["scaler_mean"]) / compiled["scaler_scale"]
+    Xs = Xs.astype(np.float32)
+
+    feature = compiled["feature"]
+    threshold = compiled["threshold"]
+    left = compiled["left"]
+    right = compiled["right"]
+    roots = compiled["roots"]
+
+    rows = np.arange(len(Xs))
+    nodes = np.repeat(roots[:, np.newaxis], len(Xs), axis=1)
+    for _ in range(int(compiled["max_depth"])):
+        go_left = Xs[rows, feature[nodes]] <= threshold[nodes]
+        nodes = np.where(go_left, left[nodes], right[nodes])
+
+    leaf_values = compiled["value"][nodes]
+    proba = np.zeros(leaf_values.shape[1:])
+    for tree_proba in leaf_values:
+        proba += tree_proba
+    proba /= len(roots)
+    return proba
+
+
+def save_compiled(compiled, directory, meta):
+    """Write each array uncompressed, then swap the directory into place.
+
+    Every writer uses its own scratch directory, so workers exporting the
+    same reload at once don't trample each other; the last rename wins.
+    Processes that mapped the old files keep reading them after the swap.
+    """
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=os.path.basename(directory) + ".", dir=parent)
+    try:
+        os.chmod(tmp_dir, 0o755)
+        for key, array in compiled.items():
+            np.save(os.path.join(tmp_dir, f"{key}.npy"), np.asarray(array), allow_pickle=False)
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+        old_dir = tmp_dir + ".old"
+        try:
+            os.rename(directory, old_dir)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    except OSError:
+        # Another worker's export landed between our rename and replace
+        if _read_meta(directory) != meta:
+            raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def load_compiled(directory, mmap_mode="r"):
+    meta = _read_meta(directory)
+    compiled = {
+        filename[:-4]: np.load(os.path.join(directory, filename), mmap_mode=mmap_mode, allow_pickle=False)
+        for filename in os.listdir(directory)
+        if filename.endswith(".npy")
+    }
+    return compiled, meta
+
+
+def _read_meta(directory):
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _export_meta(name, model_version):
+    return {"model": name, "model_version": model_version, "format": EXPORT_FORMAT}
+
+
+def export_arrays(model):
+    """Forest arrays plus the TreeSHAP table explain.py would build from them."""
+    # explain.py reads the compiled arrays through this module
+    import explain
+
+    if not is_supported(model):
+        raise ValueError("Not a tree ensemble; the numpy engine cannot evaluate it")
+    compiled = export_forest(model)
+    compiled.update(explain.table_arrays(compiled))
+    return compiled
+
+
+def export_to_disk(name, model=None, version=None):
+    """Export registry model `name`, or a reload candidate `model` with content `version`.
+
+    Returns the directory; an export already written for that version (by
+    another worker, say) is left alone.
+    """
+    if model is None:
+        model, version = model_registry.load_versioned(name)
+    directory = os.path.join(COMPILED_DIR, name)
+    meta = _export_meta(name, version)
+    if _read_meta(directory) != meta:
+        save_compiled(export_arrays(model), directory, meta)
+    return directory
+
+
+def is_exported(name="best_model"):
+    """True if the export under COMPILED_DIR was written from `name`'s current file."""
+    version = model_registry.model_version(name)
+    if (name, version) in _exported:
+        return True
+    return _read_meta(os.path.join(COMPILED_DIR, name)) == _export_meta(name, version)
+
+
+def can_compile(name="best_model"):
+    try:
+        get_compiled_versioned(name)
+    except ValueError:
+        return False
+    return True
+
+
+def get_compiled(name="best_model"):
+    return get_compiled_versioned(name)[0]
+
+
+def get_compiled_versioned(name="best_model"):
+    """(compiled arrays, (model_version, scaler_version)) for registry model `name`.
+
+    Served from the memory-mapped export under COMPILED_DIR when it was
+    written from the current file, so the pickle is never loaded; otherwise
+    the model is unpickled and compiled once per process. Raises ValueError
+    if the model isn't a forest.
+    """
+    model_version = model_registry.model_version(name)
+    scaler, scaler_version = model_registry.load_versioned("scaler")
+    # Keyed by content version so a hot-reloaded artifact is never served
+    # arrays compiled from the one it replaced
+    key = (name, model_version, scaler_version)
+    compiled = _compiled.get(key)
+    if compiled is None:
+        with _compiled_lock:
+            compiled = _compiled.get(key)
+            if compiled is None:
+                compiled = _load_exported(name, model_version)
+                if compiled is None:
+                    if (name, model_version) in _unsupported:
+                        raise ValueError(f"{name} is not a tree ensemble; the numpy engine cannot evaluate it")
+                    model, loaded_version = model_registry.load_versioned(name)
+                    # The file may have moved on since the version was pinned;
+                    # key the arrays by what was actually compiled
+                    key = (name, loaded_version, scaler_version)
+                    if not is_supported(model):
+                        _unsupported.add((name, loaded_version))
+                        raise ValueError(f"{name} is not a tree ensemble; the numpy engine cannot evaluate it")
+                    compiled = export_forest(model)
+                else:
+                    _exported.add((name, model_version))
+                compiled = with_scaler(compiled, scaler)
+                for stale in [k for k in _compiled if k[0] == name]:
+                    del _compiled[stale]
+                _compiled[key] = compiled
+    return compiled, key[1:]
+
+
+def _load_exported(name, model_version):
+    directory = os.path.join(COMPILED_DIR, name)
+    if _read_meta(directory) != _export_meta(name, model_version):
+        return None
+    try:
+        compiled, meta = load_compiled(directory)
+    except (OSError, ValueError):
+        # Replaced by another worker's export while we were reading it
+        return None
+    return compiled if meta == _export_meta(name, model_version) else None
+
+
+def main(argv=None):
+    names = argv if argv else MMAP_MODELS
+    for name in names:
+        if name not in MMAP_MODELS:
+            print(f"⚠️ {name}: skipped, only {', '.join(MMAP_MODELS)} can be exported")
+            continue
+        directory = export_to_disk(name)
+        print(f"✅ {name}: exported to {directory}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
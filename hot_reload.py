@@ -0,0 +1,267 @@
+"""Pick up retrained model artifacts without restarting the app.
+
+A daemon thread polls the files behind the loaded artifacts every
+MODEL_WATCH_INTERVAL seconds. When one has a new size or mtime it is loaded
+in the background, checked against a canary set and, if it passes, swapped
+into model_registry. A forest served from its memory-mapped export is
+re-exported instead, so it still never stays unpickled. Requests already holding the old model finish on it;
+everything after the swap sees the new one. Prediction caches are keyed by
+model version, so they roll over on their own.
+
+Canary rows come from CANARY_CSV if set (same columns as a bulk upload),
+otherwise from a fixed synthetic sample of the form's valid ranges. A new
+artifact is rejected if it can't score them, returns anything other than
+probabilities, or disagrees with the current model's High/Low call on more
+than 1 - CANARY_MIN_AGREEMENT of them. A new best_model must also compile
+for forest_engine and explain, which serve small batches and explanations.
+"""
+import datetime
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+import explain
+import forest_engine
+import model_registry
+from prediction import feature_names, frame_to_features, synthetic_inputs, valid_row_mask
+
+# ------------------- Load .env -------------------
+dotenv_path = os.path.join(os.path.dirname(__file__), ".env")
+load_dotenv(dotenv_path)
+
+logger = logging.getLogger(__name__)
+
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "10"))
+WATCHED_MODELS = ["scaler", "best_model"]
+CANARY_CSV = os.getenv("CANARY_CSV")
+CANARY_MIN_AGREEMENT = float(os.getenv("CANARY_MIN_AGREEMENT", "0.9"))
+CANARY_ROWS = 256
+
+_watcher = None
+_watcher_lock = threading.Lock()
+# (path, size, mtime_ns) of files already rejected, so a bad artifact is
+# checked once rather than on every poll
+_rejected = {}
+_history = []
+_status = {"checks": 0, "last_check": None, "last_error": None}
+
+
+def canary_inputs():
+    if CANARY_CSV:
+        X = frame_to_features(pd.read_csv(CANARY_CSV))
+        return X[valid_row_mask(X)]
+    return synthetic_inputs(CANARY_ROWS, seed=2024)
+
+
+def _proba(model, scaler, X, require_proba=False):
+    X_scaled = scaler.transform(pd.DataFrame(X, columns=feature_names))
+    # predict_heart_disease calls predict_proba directly, so the served model
+    # must support it; ensemble members may fall back to a squashed margin
+    if require_proba or (hasattr(model, "predict_proba") and getattr(model, "probability", True)):
+        return model.predict_proba(X_scaled)
+    positive = 1.0 / (1.0 + np.exp(-model.decision_function(X_scaled)))
+    return np.column_stack([1.0 - positive, positive])
+
+
+def _served_proba(name, X, scaler=None):
+    """The current `name` on X, through `scaler` (default: the current one).
+
+    A forest served from its export is scored from the mapped arrays rather
+    than unpickled just for the comparison.
+    """
+    scaler = scaler or model_registry.load_model("scaler")
+    if not model_registry.is_loaded(name) and forest_engine.is_exported(name):
+        compiled = forest_engine.with_scaler(forest_engine.get_compiled(name), scaler)
+        return forest_engine.predict_proba(compiled, X)
+    return _proba(model_registry.load_model(name), scaler, X, require_proba=name == "best_model")
+
+
+def validate(name, candidate, X=None):
+    """Score the canary rows with `candidate` in place of `name`.
+
+    Returns (ok, details). The scaler is validated through the current best
+    model, and any other artifact with the current scaler.
+    """
+    X = canary_inputs() if X is None else X
+    scorer = "best_model" if name == "scaler" else name
+
+    if len(X) == 0:
+        return False, {"reason": "Canary set has no valid rows"}
+    if name != "scaler" and getattr(candidate, "n_features_in_", len(feature_names)) != len(feature_names):
+        return False, {"reason": f"Expects {candidate.n_features_in_} features, not {len(feature_names)}"}
+    try:
+        start = time.perf_counter()
+        if name == "scaler":
+            proba = _served_proba(scorer, X, scaler=candidate)
+        else:
+            proba = _proba(candidate, model_registry.load_model("scaler"), X, require_proba=scorer == "best_model")
+        proba = np.asarray(proba, dtype=np.float64)
+        warm_ms = (time.perf_counter() - start) * 1000
+    except Exception as e:
+        return False, {"reason": f"Failed to score canary rows: {e}"}
+
+    if proba.shape != (len(X), 2):
+        return False, {"reason": f"Returned shape {proba.shape}, expected {(len(X), 2)}"}
+    if not np.isfinite(proba).all() or (proba < 0).any() or (proba > 1).any():
+        return False, {"reason": "Returned values outside [0, 1]"}
+    if not np.allclose(proba.sum(axis=1), 1.0, atol=1e-6):
+        return False, {"reason": "Class probabilities do not sum to 1"}
+    if name == "best_model":
+        # Small batches and every explanation run on forest_engine's arrays,
+        # so the served model has to compile to them and agree with itself
+        if not forest_engine.is_supported(candidate):
+            return False, {"reason": "Not a tree ensemble; the numpy engine and explanations need one"}
+        try:
+            compiled = forest_engine.export_forest(candidate, model_registry.load_model("scaler"))
+            compiled_proba = forest_engine.predict_proba(compiled, X)
+        except Exception as e:
+            return False, {"reason": f"Could not compile for the numpy engine: {e}"}
+        if not np.allclose(compiled_proba, proba, rtol=0, atol=1e-9):
+            return False, {"reason": "The numpy engine disagrees with predict_proba"}
+
+    current = _served_proba(scorer, X)
+    agreement = float(np.mean((proba[:, 1] > 0.5) == (current[:, 1] > 0.5)))
+    details = {
+        "canary_rows": len(X),
+        "agreement": agreement,
+        "mean_abs_change": float(np.mean(np.abs(proba[:, 1] - current[:, 1]))),
+        "warm_ms": warm_ms,
+    }
+    if agreement < CANARY_MIN_AGREEMENT:
+        details["reason"] = f"Agrees with the current model on {agreement:.0%} of canary rows"
+        return False, details
+    return True, details
+
+
+def reload_if_changed(name):
+    """Reload, validate and swap `name` if its file changed.
+
+    Returns "unchanged", "touched" (new mtime, same content), "swapped" or
+    "rejected".
+    """
+    if not model_registry.artifact_changed(name):
+        return "unchanged"
+    path = model_registry.model_path(name)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return "unchanged"
+    stat_key = (path, stat.st_size, stat.st_mtime_ns)
+    if stat_key in _rejected:
+        return "rejected"
+
+    current_version = model_registry.model_version(name)
+    try:
+        entry = model_registry.read_artifact(name)
+    except Exception as e:
+        # Most likely caught mid-copy; the finished write gets a new mtime
+        _reject(name, stat_key, None, {"reason": f"Could not load: {e}"})
+        return "rejected"
+    if entry["version"] == current_version:
+        _keep(name, entry)
+        return "touched"
+
+    ok, details = validate(name, entry["model"])
+    if not ok:
+        _reject(name, stat_key, entry["version"], details)
+        return "rejected"
+
+    if name != "scaler" and forest_engine.is_supported(entry["model"]):
+        try:
+            if model_registry.is_loaded(name) or not forest_engine.is_exported(name):
+                # Build the explanation table ahead of the swap so the first
+                # request on the new model doesn't wait for it
+                explain.prepare(name, forest_engine.export_forest(entry["model"]), entry["version"])
+            else:
+                # Served from its export: write the candidate's arrays (and
+                # table) over it, and drop the pickle again once swapped
+                try:
+                    forest_engine.export_to_disk(name, entry["model"], entry["version"])
+                except OSError:
+                    # Can't write the export here; serve the candidate from memory
+                    model_registry.install(name, entry)
+        except Exception as e:
+            details["reason"] = f"Could not build explanations: {e}"
+            _reject(name, stat_key, entry["version"], details)
+            return "rejected"
+    _keep(name, entry)
+    _record(name, "swapped", current_version, entry["version"], details)
+    return "swapped"
+
+
+def _keep(name, entry):
+    # Artifacts nobody has unpickled stay that way; only the version moves
+    if model_registry.is_loaded(name):
+        model_registry.install(name, entry)
+    else:
+        model_registry.pin(name, entry)
+
+
+def _reject(name, stat_key, version, details):
+    _rejected[stat_key] = details["reason"]
+    _record(name, "rejected", model_registry.model_version(name), version, details)
+    logger.warning("Hot reload rejected %s (%s): %s", name, version, details["reason"])
+
+
+def _record(name, outcome, old_version, new_version, details):
+    _history.append({
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "model": name,
+        "outcome": outcome,
+        "old_version": old_version,
+        "new_version": new_version,
+        **details,
+    })
+    del _history[:-50]
+
+
+def check_once(names=None):
+    results = {}
+    for name in names or WATCHED_MODELS:
+        if model_registry.is_tracked(name):
+            results[name] = reload_if_changed(name)
+    _status["checks"] += 1
+    _status["last_check"] = datetime.datetime.now().isoformat(timespec="seconds")
+    return results
+
+
+def _watch(interval, names):
+    while True:
+        time.sleep(interval)
+        try:
+            check_once(names)
+            _status["last_error"] = None
+        except Exception as e:
+            logger.exception("Hot reload check failed")
+            _status["last_error"] = f"{datetime.datetime.now().isoformat(timespec='seconds')}: {e}"
+
+
+def start(interval=None, names=None):
+    """Start the watcher thread; safe to call on every Streamlit rerun."""
+    global _watcher
+    interval = MODEL_WATCH_INTERVAL if interval is None else interval
+    if interval <= 0:
+        return None
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = threading.Thread(
+                target=_watch, args=(interval, names), daemon=True, name="model-hot-reload"
+            )
+            _watcher.start()
+    return _watcher
+
+
+def status():
+    return {
+        "running": _watcher is not None and _watcher.is_alive(),
+        "interval": MODEL_WATCH_INTERVAL,
+        "checks": _status["checks"],
+        "last_check": _status["last_check"],
+        "last_error": _status["last_error"],
+        "history": list(_history),
+    }
@@ -0,0 +1,118 @@
+"""Global feature importance derived from the loaded model.
+
+Impurity importances come straight from `feature_importances_`. Permutation
+importance needs labelled reference data (REFERENCE_DATA_CSV with a
+TARGET_COLUMN) and is slow, so it runs on a background thread that fans out
+over every core, and the result is written to ARTIFACTS_DIR/importance keyed
+by the model and reference-data hashes. Pages only ever read what is already
+on disk.
+"""
+import datetime
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import model_registry
+from prediction import feature_names, frame_to_features, valid_row_mask
+
+IMPORTANCE_DIR = os.path.join(model_registry.ARTIFACTS_DIR, "importance")
+N_REPEATS = 10
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def impurity_importance(name="best_model"):
+    model = model_registry.load_model(name)
+    if not hasattr(model, "feature_importances_"):
+        return None
+    return dict(zip(feature_names, np.asarray(model.feature_importances_, dtype=float).tolist()))
+
+
+def result_path(name="best_model", data_path=None):
+    data_path = data_path or model_registry.REFERENCE_DATA_CSV
+    if not data_path or not os.path.exists(data_path):
+        return None
+    model_hash = model_registry.model_version(name)
+    data_hash = model_registry.cached_file_hash(data_path)[:12]
+    return os.path.join(IMPORTANCE_DIR, f"{name}-{model_hash}-{data_hash}.json")
+
+
+def permutation_importance(name="best_model", data_path=None, start=True):
+    """Return (status, result) for the persisted permutation importance.
+
+    status is "ready", "running", "failed", "missing" (not computed and
+    `start` is False), or "unavailable" when no reference data is
+    configured. If nothing is on disk yet and `start` is set, the computation
+    is kicked off in the background and this returns right away.
+    """
+    path = result_path(name, data_path)
+    if path is None:
+        return "unavailable", None
+    if os.path.exists(path):
+        with open(path) as f:
+            return "ready", json.load(f)
+
+    with _jobs_lock:
+        job = _jobs.get(path)
+        # A failed job stays failed for the life of the process rather than
+        # being relaunched on every rerun
+        if start and job is None:
+            job = {"status": "running", "error": None}
+            _jobs[path] = job
+            threading.Thread(
+                target=_run_job, args=(job, name, data_path or model_registry.REFERENCE_DATA_CSV, path),
+                daemon=True, name=f"permutation-importance-{name}",
+            ).start()
+    if job is None:
+        return "missing", None
+    return job["status"], {"error": job["error"]} if job["error"] else None
+
+
+def _run_job(job, name, data_path, path):
+    try:
+        result = compute_permutation_importance(name, data_path)
+        os.makedirs(IMPORTANCE_DIR, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(result, f, indent=2)
+        os.replace(tmp_path, path)
+        job["status"] = "ready"
+    except Exception as e:
+        job["error"] = str(e)
+        job["status"] = "failed"
+
+
+def compute_permutation_importance(name, data_path, n_repeats=N_REPEATS):
+    from sklearn.inspection import permutation_importance as sklearn_permutation_importance
+
+    df = pd.read_csv(data_path)
+    if model_registry.TARGET_COLUMN not in df.columns:
+        raise ValueError(f"Reference data has no '{model_registry.TARGET_COLUMN}' column")
+    X = frame_to_features(df)
+    valid = valid_row_mask(X)
+    X, y = X[valid], df[model_registry.TARGET_COLUMN].to_numpy()[valid]
+
+    model, model_version = model_registry.load_versioned(name)
+    scaler = model_registry.load_model("scaler")
+    X_scaled = scaler.transform(pd.DataFrame(X, columns=feature_names))
+    # n_jobs=-1 scores each feature's permutations in a separate worker
+    # (sklearn parallelises over the 7 features, not the repeats), so at
+    # most 7 cores are busy whatever n_repeats is
+    result = sklearn_permutation_importance(
+        model, X_scaled, y, scoring="roc_auc", n_repeats=n_repeats, n_jobs=-1, random_state=0
+    )
+    return {
+        "model": name,
+        "model_version": model_version,
+        "reference_data": os.path.basename(data_path),
+        "rows": int(len(X)),
+        "n_repeats": n_repeats,
+        "scoring": "roc_auc",
+        "computed_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "importances_mean": dict(zip(feature_names, result.importances_mean.tolist())),
+        "importances_std": dict(zip(feature_names, result.importances_std.tolist())),
+    }
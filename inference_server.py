@@ -0,0 +1,190 @@
+"""Micro-batching prediction service.
+
+Run with:
+    uvicorn inference_server:app --port 8000
+
+Endpoints:
+    POST /predict   {"input": {"age": 45, "gender": 1, ...}}  or  {"inputs": [...]}
+    GET  /health
+    GET  /stats
+
+Concurrent requests are queued and scored together: the queue is flushed as
+one predict_heart_disease_batch call when MICROBATCH_MAX_SIZE rows are
+waiting or MICROBATCH_MAX_WAIT_MS has passed since the first of them arrived.
+"""
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+import hot_reload
+import model_registry
+from prediction import predict_heart_disease_batch, preload, to_feature_matrix, validate_inputs
+
+# ------------------- Load .env -------------------
+dotenv_path = os.path.join(os.path.dirname(__file__), ".env")
+load_dotenv(dotenv_path)
+
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "64"))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "5"))
+
+
+class MicroBatcher:
+    def __init__(self, max_batch_size=MICROBATCH_MAX_SIZE, max_wait_ms=MICROBATCH_MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._task = None
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self.busy_seconds = 0.0
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, X):
+        """Queue validated feature rows and wait for their probabilities."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((X, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            # Anything wrong with this batch fails its requests, never the
+            # batcher itself, which every later request depends on
+            try:
+                await self._run_batch(loop, pending)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _run_batch(self, loop, pending):
+        size = len(pending[0][0])
+        deadline = loop.time() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            pending.append(item)
+            size += len(item[0])
+
+        X = np.vstack([rows for rows, _ in pending])
+        start = time.perf_counter()
+        # Model inference releases the event loop while it runs
+        proba = await loop.run_in_executor(None, predict_heart_disease_batch, X)
+        self.busy_seconds += time.perf_counter() - start
+        self.batches += 1
+        self.rows += len(X)
+        self.largest_batch = max(self.largest_batch, len(X))
+
+        offset = 0
+        for rows, future in pending:
+            if not future.done():
+                future.set_result(proba[offset:offset + len(rows)])
+            offset += len(rows)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "busy_seconds": self.busy_seconds,
+        }
+
+
+batcher = MicroBatcher()
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    method, path = scope["method"], scope["path"]
+    if path == "/health" and method == "GET":
+        await _respond(send, 200, {"status": "ok", "model_version": model_registry.model_version("best_model")})
+    elif path == "/stats" and method == "GET":
+        await _respond(send, 200, batcher.stats())
+    elif path == "/predict" and method == "POST":
+        await _predict(receive, send)
+    else:
+        await _respond(send, 404, {"error": "Not found"})
+
+
+async def _predict(receive, send):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+
+    try:
+        payload = json.loads(body)
+        single = "input" in payload
+        rows = [payload["input"]] if single else payload["inputs"]
+        # Validate per request so one bad row can't fail a whole batch
+        X = validate_inputs(to_feature_matrix(rows))
+    except (ValueError, KeyError, TypeError) as e:
+        await _respond(send, 400, {"error": str(e) or "Body must contain 'input' or 'inputs'"})
+        return
+
+    if len(X) == 0:
+        await _respond(send, 200, {"results": []})
+        return
+
+    try:
+        proba = await batcher.submit(X)
+    except Exception as e:
+        await _respond(send, 500, {"error": f"Prediction failed: {e}"})
+        return
+
+    results = [
+        {"risk_score": float(p[1] * 100), "risk_category": "High Risk" if p[1] * 100 > 50 else "Low Risk"}
+        for p in proba
+    ]
+    await _respond(send, 200, results[0] if single else {"results": results})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Load the scaler and model before accepting traffic
+            await asyncio.get_running_loop().run_in_executor(None, preload)
+            batcher.start()
+            hot_reload.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def _respond(send, status, payload):
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,494 @@
+"""Versioned schema migrations.
+
+Usage:
+    python -m migrations            # apply pending migrations
+    python -m migrations --status   # list applied and pending versions
+
+Each migration runs in its own transaction and is recorded in
+schema_migrations. The app calls run_pending() once per process at start-up;
+a transaction-level advisory lock makes concurrent workers apply them one at
+a time. Migrations are written so they also bring a database created before
+this module existed up to date.
+"""
+import argparse
+import sys
+import threading
+
+import database
+
+# Arbitrary key for pg_advisory_xact_lock, shared by every app process
+MIGRATION_LOCK_ID = 4_721_003
+
+MIGRATIONS = [
+    (1, "create tables", """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id SERIAL PRIMARY KEY,
+            username VARCHAR(50) NOT NULL UNIQUE,
+            email VARCHAR(100) NOT NULL UNIQUE,
+            password_hash VARCHAR(255) NOT NULL,
+            is_admin BOOLEAN NOT NULL DEFAULT FALSE,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS patients (
+            patient_id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+            unique_id VARCHAR(50) NOT NULL UNIQUE,
+            full_name VARCHAR(100),
+            date_of_birth DATE,
+            gender VARCHAR(10),
+            contact_number VARCHAR(20),
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE IF NOT EXISTS health_records (
+            record_id SERIAL PRIMARY KEY,
+            patient_id INTEGER NOT NULL REFERENCES patients(patient_id) ON DELETE CASCADE,
+            age FLOAT,
+            gender INTEGER,
+            bmi FLOAT,
+            chol FLOAT,
+            tg FLOAT,
+            hdl FLOAT,
+            ldl FLOAT,
+            risk_score FLOAT,
+            risk_category VARCHAR(20),
+            notes TEXT,
+            model_version VARCHAR(64),
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    (2, "bring pre-existing tables up to date", """
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS is_admin BOOLEAN NOT NULL DEFAULT FALSE;
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP;
+        ALTER TABLE health_records ADD COLUMN IF NOT EXISTS model_version VARCHAR(64);
+        CREATE UNIQUE INDEX IF NOT EXISTS users_username_key ON users (username);
+        CREATE UNIQUE INDEX IF NOT EXISTS users_email_key ON users (email);
+
+        -- Recreate the foreign keys with ON DELETE CASCADE, whatever they
+        -- were called when the tables were first made
+        DO $$
+        DECLARE fk RECORD;
+        BEGIN
+            FOR fk IN
+                SELECT conrelid::regclass AS tbl, conname
+                FROM pg_constraint
+                WHERE contype = 'f'
+                  AND conrelid IN ('patients'::regclass, 'health_records'::regclass)
+            LOOP
+                EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', fk.tbl, fk.conname);
+            END LOOP;
+        END $$;
+        ALTER TABLE patients ADD CONSTRAINT patients_user_id_fkey
+            FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE;
+        ALTER TABLE health_records ADD CONSTRAINT health_records_patient_id_fkey
+            FOREIGN KEY (patient_id) REFERENCES patients(patient_id) ON DELETE CASCADE;
+    """),
+    (3, "indexes for patient and history lookups", """
+        CREATE INDEX IF NOT EXISTS patients_user_id_idx ON patients (user_id);
+        CREATE INDEX IF NOT EXISTS health_records_patient_created_idx
+            ON health_records (patient_id, created_at DESC);
+    """),
+    (4, "keyset index for paging through health history", """
+        -- record_id breaks ties between readings saved in the same instant,
+        -- so (created_at, record_id) cursors are answered from the index
+        CREATE INDEX IF NOT EXISTS health_records_patient_created_record_idx
+            ON health_records (patient_id, created_at DESC, record_id DESC);
+        DROP INDEX IF EXISTS health_records_patient_created_idx;
+    """),
+    (5, "indexes for admin user search", """
+        -- Prefix matches (short search terms) on the lower-cased columns
+        CREATE INDEX IF NOT EXISTS users_username_lower_prefix_idx
+            ON users (lower(username) text_pattern_ops);
+        CREATE INDEX IF NOT EXISTS users_email_lower_prefix_idx
+            ON users (lower(email) text_pattern_ops);
+
+        -- Substring matches use trigram indexes where pg_trgm is available;
+        -- without it they still work, just without an index
+        DO $$
+        BEGIN
+            CREATE EXTENSION IF NOT EXISTS pg_trgm;
+            CREATE INDEX IF NOT EXISTS users_username_lower_trgm_idx
+                ON users USING gin (lower(username) gin_trgm_ops);
+            CREATE INDEX IF NOT EXISTS users_email_lower_trgm_idx
+                ON users USING gin (lower(email) gin_trgm_ops);
+        EXCEPTION WHEN feature_not_supported OR insufficient_privilege OR undefined_file THEN
+            RAISE NOTICE 'pg_trgm unavailable, substring user search will not be indexed: %', SQLERRM;
+        END $$;
+    """),
+    (6, "trigger-maintained admin statistics", """
+        -- Counters for the admin dashboard, kept current by statement-level
+        -- triggers so reading them never scans users or health_records.
+        -- A single totals row; every writer updates it first, which also
+        -- fixes the lock order against admin_daily_stats.
+        CREATE TABLE IF NOT EXISTS admin_stats_totals (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            users BIGINT NOT NULL DEFAULT 0,
+            assessments BIGINT NOT NULL DEFAULT 0,
+            high_risk BIGINT NOT NULL DEFAULT 0
+        );
+        INSERT INTO admin_stats_totals DEFAULT VALUES ON CONFLICT DO NOTHING;
+
+        CREATE TABLE IF NOT EXISTS admin_daily_stats (
+            day DATE PRIMARY KEY,
+            new_users INTEGER NOT NULL DEFAULT 0,
+            assessments INTEGER NOT NULL DEFAULT 0,
+            high_risk INTEGER NOT NULL DEFAULT 0,
+            active_users INTEGER NOT NULL DEFAULT 0
+        );
+
+        -- Patients with at least one assessment on a day; a new row here is
+        -- what bumps active_users
+        CREATE TABLE IF NOT EXISTS admin_daily_active (
+            day DATE NOT NULL,
+            patient_id INTEGER NOT NULL REFERENCES patients(patient_id) ON DELETE CASCADE,
+            PRIMARY KEY (day, patient_id)
+        );
+        CREATE INDEX IF NOT EXISTS admin_daily_active_patient_idx ON admin_daily_active (patient_id);
+
+        CREATE OR REPLACE FUNCTION admin_stats_users_inserted() RETURNS trigger AS $$
+        BEGIN
+            UPDATE admin_stats_totals SET users = users + (SELECT COUNT(*) FROM new_rows);
+            INSERT INTO admin_daily_stats (day, new_users)
+                SELECT created_at::date, COUNT(*) FROM new_rows GROUP BY 1 ORDER BY 1
+            ON CONFLICT (day) DO UPDATE SET new_users = admin_daily_stats.new_users + EXCLUDED.new_users;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION admin_stats_users_deleted() RETURNS trigger AS $$
+        BEGIN
+            UPDATE admin_stats_totals SET users = users - (SELECT COUNT(*) FROM old_rows);
+            UPDATE admin_daily_stats s SET new_users = s.new_users - d.n
+            FROM (SELECT created_at::date AS day, COUNT(*) AS n FROM old_rows GROUP BY 1) d
+            WHERE s.day = d.day;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION admin_stats_records_inserted() RETURNS trigger AS $$
+        BEGIN
+            UPDATE admin_stats_totals SET
+                assessments = assessments + (SELECT COUNT(*) FROM new_rows),
+                high_risk = high_risk + (SELECT COUNT(*) FROM new_rows WHERE risk_category = 'High Risk');
+            INSERT INTO admin_daily_stats (day, assessments, high_risk)
+                SELECT created_at::date, COUNT(*), COUNT(*) FILTER (WHERE risk_category = 'High Risk')
+                FROM new_rows GROUP BY 1 ORDER BY 1
+            ON CONFLICT (day) DO UPDATE SET
+                assessments = admin_daily_stats.assessments + EXCLUDED.assessments,
+                high_risk = admin_daily_stats.high_risk + EXCLUDED.high_risk;
+            WITH first_today AS (
+                INSERT INTO admin_daily_active (day, patient_id)
+                    SELECT DISTINCT created_at::date, patient_id FROM new_rows
+                ON CONFLICT DO NOTHING
+                RETURNING day
+            )
+            UPDATE admin_daily_stats s SET active_users = s.active_users + f.n
+            FROM (SELECT day, COUNT(*) AS n FROM first_today GROUP BY day) f
+            WHERE s.day = f.day;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        -- Records only go away with their patient, whose admin_daily_active
+        -- rows cascade and correct active_users below
+        CREATE OR REPLACE FUNCTION admin_stats_records_deleted() RETURNS trigger AS $$
+        BEGIN
+            UPDATE admin_stats_totals SET
+                assessments = assessments - (SELECT COUNT(*) FROM old_rows),
+                high_risk = high_risk - (SELECT COUNT(*) FROM old_rows WHERE risk_category = 'High Risk');
+            UPDATE admin_daily_stats s SET
+                assessments = s.assessments - d.n,
+                high_risk = s.high_risk - d.high
+            FROM (
+                SELECT created_at::date AS day, COUNT(*) AS n,
+                       COUNT(*) FILTER (WHERE risk_category = 'High Risk') AS high
+                FROM old_rows GROUP BY 1
+            ) d
+            WHERE s.day = d.day;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION admin_stats_active_deleted() RETURNS trigger AS $$
+        BEGIN
+            UPDATE admin_daily_stats s SET active_users = s.active_users - d.n
+            FROM (SELECT day, COUNT(*) AS n FROM old_rows GROUP BY day) d
+            WHERE s.day = d.day;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        -- Recount everything; used to backfill and after a TRUNCATE
+        CREATE OR REPLACE FUNCTION admin_stats_rebuild() RETURNS void AS $$
+        BEGIN
+            DELETE FROM admin_daily_active;
+            DELETE FROM admin_daily_stats;
+            UPDATE admin_stats_totals SET
+                users = (SELECT COUNT(*) FROM users),
+                assessments = (SELECT COUNT(*) FROM health_records),
+                high_risk = (SELECT COUNT(*) FROM health_records WHERE risk_category = 'High Risk');
+            INSERT INTO admin_daily_active (day, patient_id)
+                SELECT DISTINCT created_at::date, patient_id FROM health_records;
+            INSERT INTO admin_daily_stats (day, new_users, assessments, high_risk, active_users)
+                SELECT day, SUM(new_users), SUM(assessments), SUM(high_risk), SUM(active_users)
+                FROM (
+                    SELECT created_at::date AS day, COUNT(*) AS new_users,
+                           0 AS assessments, 0 AS high_risk, 0 AS active_users
+                    FROM users GROUP BY 1
+                    UNION ALL
+                    SELECT created_at::date, 0, COUNT(*),
+                           COUNT(*) FILTER (WHERE risk_category = 'High Risk'), 0
+                    FROM health_records GROUP BY 1
+                    UNION ALL
+                    SELECT day, 0, 0, 0, COUNT(*) FROM admin_daily_active GROUP BY 1
+                ) counts
+                GROUP BY day;
+        END $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION admin_stats_truncated() RETURNS trigger AS $$
+        BEGIN
+            PERFORM admin_stats_rebuild();
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS admin_stats_users_insert ON users;
+        CREATE TRIGGER admin_stats_users_insert AFTER INSERT ON users
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION admin_stats_users_inserted();
+        DROP TRIGGER IF EXISTS admin_stats_users_delete ON users;
+        CREATE TRIGGER admin_stats_users_delete AFTER DELETE ON users
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION admin_stats_users_deleted();
+        DROP TRIGGER IF EXISTS admin_stats_records_insert ON health_records;
+        CREATE TRIGGER admin_stats_records_insert AFTER INSERT ON health_records
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION admin_stats_records_inserted();
+        DROP TRIGGER IF EXISTS admin_stats_records_delete ON health_records;
+        CREATE TRIGGER admin_stats_records_delete AFTER DELETE ON health_records
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION admin_stats_records_deleted();
+        DROP TRIGGER IF EXISTS admin_stats_active_delete ON admin_daily_active;
+        CREATE TRIGGER admin_stats_active_delete AFTER DELETE ON admin_daily_active
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION admin_stats_active_deleted();
+        DROP TRIGGER IF EXISTS admin_stats_users_truncate ON users;
+        CREATE TRIGGER admin_stats_users_truncate AFTER TRUNCATE ON users
+            FOR EACH STATEMENT EXECUTE FUNCTION admin_stats_truncated();
+        DROP TRIGGER IF EXISTS admin_stats_records_truncate ON health_records;
+        CREATE TRIGGER admin_stats_records_truncate AFTER TRUNCATE ON health_records
+            FOR EACH STATEMENT EXECUTE FUNCTION admin_stats_truncated();
+
+        SELECT admin_stats_rebuild();
+    """),
+    (7, "shard the admin statistics counters", """
+        -- With one totals row (and one daily row per day) every insert into
+        -- users or health_records queued on the same row lock until the
+        -- writer committed. Each backend now adds to its own of 16 shard
+        -- rows; readers sum them and admin_stats_rebuild folds them back
+        -- into shard 0. A transaction only ever touches its
+        -- own shard, always totals before daily rows (in day order), so
+        -- writers on different shards never wait for each other and ones on
+        -- the same shard can't deadlock.
+        CREATE OR REPLACE FUNCTION admin_stats_shard() RETURNS SMALLINT AS $$
+            SELECT (pg_backend_pid() % 16)::SMALLINT
+        $$ LANGUAGE sql STABLE;
+
+        DROP TABLE admin_stats_totals;
+        CREATE TABLE admin_stats_totals (
+            shard SMALLINT PRIMARY KEY,
+            users BIGINT NOT NULL DEFAULT 0,
+            assessments BIGINT NOT NULL DEFAULT 0,
+            high_risk BIGINT NOT NULL DEFAULT 0
+        );
+        ALTER TABLE admin_daily_stats ADD COLUMN shard SMALLINT NOT NULL DEFAULT 0;
+        ALTER TABLE admin_daily_stats DROP CONSTRAINT admin_daily_stats_pkey;
+        ALTER TABLE admin_daily_stats ADD PRIMARY KEY (day, shard);
+
+        CREATE OR REPLACE FUNCTION admin_stats_users_inserted() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO admin_stats_totals (shard, users)
+                SELECT admin_stats_shard(), COUNT(*) FROM new_rows
+            ON CONFLICT (shard) DO UPDATE SET users = admin_stats_totals.users + EXCLUDED.users;
+            INSERT INTO admin_daily_stats (day, shard, new_users)
+                SELECT created_at::date, admin_stats_shard(), COUNT(*) FROM new_rows GROUP BY 1 ORDER BY 1
+            ON CONFLICT (day, shard) DO UPDATE SET new_users = admin_daily_stats.new_users + EXCLUDED.new_users;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION admin_stats_users_deleted() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO admin_stats_totals (shard, users)
+                SELECT admin_stats_shard(), -COUNT(*) FROM old_rows
+            ON CONFLICT (shard) DO UPDATE SET users = admin_stats_totals.users + EXCLUDED.users;
+            INSERT INTO admin_daily_stats (day, shard, new_users)
+                SELECT created_at::date, admin_stats_shard(), -COUNT(*) FROM old_rows GROUP BY 1 ORDER BY 1
+            ON CONFLICT (day, shard) DO UPDATE SET new_users = admin_daily_stats.new_users + EXCLUDED.new_users;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION admin_stats_records_inserted() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO admin_stats_totals (shard, assessments, high_risk)
+                SELECT admin_stats_shard(), COUNT(*), COUNT(*) FILTER (WHERE risk_category = 'High Risk')
+                FROM new_rows
+            ON CONFLICT (shard) DO UPDATE SET
+                assessments = admin_stats_totals.assessments + EXCLUDED.assessments,
+                high_risk = admin_stats_totals.high_risk + EXCLUDED.high_risk;
+            INSERT INTO admin_daily_stats (day, shard, assessments, high_risk)
+                SELECT created_at::date, admin_stats_shard(), COUNT(*),
+                       COUNT(*) FILTER (WHERE risk_category = 'High Risk')
+                FROM new_rows GROUP BY 1 ORDER BY 1
+            ON CONFLICT (day, shard) DO UPDATE SET
+                assessments = admin_daily_stats.assessments + EXCLUDED.assessments,
+                high_risk = admin_daily_stats.high_risk + EXCLUDED.high_risk;
+            WITH first_today AS (
+                INSERT INTO admin_daily_active (day, patient_id)
+                    SELECT DISTINCT created_at::date, patient_id FROM new_rows
+                ON CONFLICT DO NOTHING
+                RETURNING day
+            )
+            INSERT INTO admin_daily_stats (day, shard, active_users)
+                SELECT day, admin_stats_shard(), COUNT(*) FROM first_today GROUP BY day ORDER BY day
+            ON CONFLICT (day, shard) DO UPDATE SET active_users = admin_daily_stats.active_users + EXCLUDED.active_users;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION admin_stats_records_deleted() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO admin_stats_totals (shard, assessments, high_risk)
+                SELECT admin_stats_shard(), -COUNT(*), -COUNT(*) FILTER (WHERE risk_category = 'High Risk')
+                FROM old_rows
+            ON CONFLICT (shard) DO UPDATE SET
+                assessments = admin_stats_totals.assessments + EXCLUDED.assessments,
+                high_risk = admin_stats_totals.high_risk + EXCLUDED.high_risk;
+            INSERT INTO admin_daily_stats (day, shard, assessments, high_risk)
+                SELECT created_at::date, admin_stats_shard(), -COUNT(*),
+                       -COUNT(*) FILTER (WHERE risk_category = 'High Risk')
+                FROM old_rows GROUP BY 1 ORDER BY 1
+            ON CONFLICT (day, shard) DO UPDATE SET
+                assessments = admin_daily_stats.assessments + EXCLUDED.assessments,
+                high_risk = admin_daily_stats.high_risk + EXCLUDED.high_risk;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        CREATE OR REPLACE FUNCTION admin_stats_active_deleted() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO admin_daily_stats (day, shard, active_users)
+                SELECT day, admin_stats_shard(), -COUNT(*) FROM old_rows GROUP BY day ORDER BY day
+            ON CONFLICT (day, shard) DO UPDATE SET active_users = admin_daily_stats.active_users + EXCLUDED.active_users;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql;
+
+        -- Recount everything into shard 0; used to backfill, after a
+        -- TRUNCATE, and to fold the shards back together
+        CREATE OR REPLACE FUNCTION admin_stats_rebuild() RETURNS void AS $$
+        BEGIN
+            DELETE FROM admin_daily_active;
+            DELETE FROM admin_daily_stats;
+            DELETE FROM admin_stats_totals;
+            INSERT INTO admin_stats_totals (shard, users, assessments, high_risk)
+                SELECT 0,
+                       (SELECT COUNT(*) FROM users),
+                       (SELECT COUNT(*) FROM health_records),
+                       (SELECT COUNT(*) FROM health_records WHERE risk_category = 'High Risk');
+            INSERT INTO admin_daily_active (day, patient_id)
+                SELECT DISTINCT created_at::date, patient_id FROM health_records;
+            INSERT INTO admin_daily_stats (day, shard, new_users, assessments, high_risk, active_users)
+                SELECT day, 0, SUM(new_users), SUM(assessments), SUM(high_risk), SUM(active_users)
+                FROM (
+                    SELECT created_at::date AS day, COUNT(*) AS new_users,
+                           0 AS assessments, 0 AS high_risk, 0 AS active_users
+                    FROM users GROUP BY 1
+                    UNION ALL
+                    SELECT created_at::date, 0, COUNT(*),
+                           COUNT(*) FILTER (WHERE risk_category = 'High Risk'), 0
+                    FROM health_records GROUP BY 1
+                    UNION ALL
+                    SELECT day, 0, 0, 0, COUNT(*) FROM admin_daily_active GROUP BY 1
+                ) counts
+                GROUP BY day;
+        END $$ LANGUAGE plpgsql;
+
+        SELECT admin_stats_rebuild();
+    """),
+]
+
+_applied_in_process = False
+_lock = threading.Lock()
+
+
+def _ensure_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(conn):
+    with conn.cursor() as cursor:
+        _ensure_table(cursor)
+        cursor.execute("SELECT version FROM schema_migrations")
+        versions = {row[0] for row in cursor.fetchall()}
+    conn.commit()
+    return versions
+
+
+def migrate(conn, log=None):
+    """Apply every pending migration in order; returns the versions applied."""
+    applied = []
+    for version, name, sql in MIGRATIONS:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            _ensure_table(cursor)
+            # Checked under the lock so two workers never apply the same one
+            cursor.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+            if cursor.fetchone():
+                conn.commit()
+                continue
+            cursor.execute(sql)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name)
+            )
+        conn.commit()
+        applied.append(version)
+        if log:
+            log(f"Applied migration {version:04d}: {name}")
+    return applied
+
+
+def run_pending(pool=None):
+    """Apply pending migrations once per process (safe on every rerun)."""
+    global _applied_in_process
+    if _applied_in_process:
+        return []
+    with _lock:
+        if _applied_in_process:
+            return []
+        pool = pool or database.get_pool()
+        with pool.connection() as conn:
+            try:
+                applied = migrate(conn, log=print)
+            except Exception:
+                conn.rollback()
+                raise
+        _applied_in_process = True
+    return applied
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply Cardio-AI database migrations.")
+    parser.add_argument("--status", action="store_true", help="Show applied and pending migrations")
+    args = parser.parse_args(argv)
+
+    with database.get_pool().connection() as conn:
+        if args.status:
+            done = applied_versions(conn)
+            for version, name, _ in MIGRATIONS:
+                print(f"{'applied' if version in done else 'pending':>8}  {version:04d}  {name}")
+            return 0
+        applied = migrate(conn, log=print)
+    print(f"✅ {len(applied)} migration(s) applied" if applied else "✅ Schema is up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+import hashlib
+import os
+import sys
+import threading
+import time
+
+import joblib
+import numpy as np
+from dotenv import load_dotenv
+
+# ------------------- Load .env -------------------
+dotenv_path = os.path.join(os.path.dirname(__file__), ".env")
+load_dotenv(dotenv_path)
+
+# Artifacts are looked up next to this file unless MODEL_DIR points elsewhere
+MODEL_DIR = os.getenv("MODEL_DIR") or os.path.dirname(os.path.abspath(__file__))
+
+# Derived results (importances, evaluation metrics) are cached here
+ARTIFACTS_DIR = os.getenv("ARTIFACTS_DIR") or os.path.join(MODEL_DIR, "artifacts")
+
+# Labelled reference data for importance and evaluation jobs
+REFERENCE_DATA_CSV = os.getenv("REFERENCE_DATA_CSV")
+TARGET_COLUMN = os.getenv("TARGET_COLUMN", "target")
+
+MODEL_FILES = {
+    "best_model": "best_model (2).pkl",
+    "random_forest": "random_forest_model.pkl",
+    "xgboost": "xgboost_model.pkl",
+    "svm": "svm_model.pkl",
+    "logistic_regression": "logistic_regression_model (1).pkl",
+    "scaler": "scaler (1).pkl",
+}
+
+# ------------------- Process-wide cache -------------------
+# Streamlit re-executes app.py on every interaction, but imported modules
+# stay in sys.modules, so anything stored here is loaded once per process.
+_cache = {}
+_cache_lock = threading.Lock()
+
+# Artifacts that are only served from a memory-mapped export (forest_engine)
+# are never unpickled; this holds the version and file stat of the file they
+# were exported from, so cache keys and the hot-reload watcher still work.
+_pinned = {}
+
+
+def model_path(name):
+    if name not in MODEL_FILES:
+        raise KeyError(f"Unknown model artifact: {name}")
+    return os.path.join(MODEL_DIR, MODEL_FILES[name])
+
+
+def load_model(name):
+    """Return the deserialized artifact `name`, loading it on first use."""
+    entry = _cache.get(name)
+    if entry is not None:
+        return entry["model"]
+
+    with _cache_lock:
+        entry = _cache.get(name)
+        if entry is None:
+            entry = read_artifact(name)
+            _cache[name] = entry
+            _pinned.pop(name, None)
+    return entry["model"]
+
+
+def read_artifact(name):
+    """Deserialize `name` from disk into a cache entry without installing it."""
+    path = model_path(name)
+    stat = os.stat(path)
+    start = time.perf_counter()
+    model = joblib.load(path)
+    load_seconds = time.perf_counter() - start
+    return {
+        "model": model,
+        "version": file_hash(path)[:12],
+        "path": path,
+        "load_seconds": load_seconds,
+        "size_bytes": _estimate_size(model),
+        "file_bytes": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def install(name, entry):
+    """Swap in a new entry for `name` and return the one it replaced.
+
+    Rebinding the dict slot is atomic, so a request that already fetched the
+    old model keeps using it until it finishes.
+    """
+    with _cache_lock:
+        previous = _cache.get(name)
+        _cache[name] = entry
+        _pinned.pop(name, None)
+    return previous
+
+
+def pin(name, entry):
+    """Record `entry`'s version and file stat for `name` without keeping the model."""
+    with _cache_lock:
+        _pinned[name] = {key: entry[key] for key in ("version", "path", "file_bytes", "mtime_ns")}
+
+
+def artifact_changed(name):
+    """True if the file behind a loaded or pinned artifact has a new size or mtime."""
+    entry = _cache.get(name) or _pinned.get(name)
+    if entry is None:
+        return False
+    try:
+        stat = os.stat(entry["path"])
+    except FileNotFoundError:
+        return False
+    return (stat.st_size, stat.st_mtime_ns) != (entry["file_bytes"], entry["mtime_ns"])
+
+
+def is_loaded(name):
+    return name in _cache
+
+
+def is_tracked(name):
+    return name in _cache or name in _pinned
+
+
+def load_versioned(name):
+    """(model, version) taken from the same cache entry.
+
+    Use this instead of separate load_model/model_version calls where the
+    two must agree across a hot reload.
+    """
+    load_model(name)
+    entry = _cache[name]
+    return entry["model"], entry["version"]
+
+
+def model_version(name):
+    """Short content hash of the artifact, used to key cached results.
+
+    Taken from the loaded entry if there is one. Otherwise the file is hashed
+    once and that version pinned, without unpickling, until the hot-reload
+    watcher swaps it.
+    """
+    entry = _cache.get(name) or _pinned.get(name)
+    if entry is None:
+        with _cache_lock:
+            entry = _cache.get(name) or _pinned.get(name)
+            if entry is None:
+                path = model_path(name)
+                stat = os.stat(path)
+                entry = {
+                    "version": file_hash(path)[:12],
+                    "path": path,
+                    "file_bytes": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                }
+                _pinned[name] = entry
+    return entry["version"]
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+_file_hashes = {}
+
+
+def cached_file_hash(path):
+    """file_hash, recomputed only when the file's size or mtime changes."""
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    digest = _file_hashes.get(key)
+    if digest is None:
+        digest = file_hash(path)
+        _file_hashes[key] = digest
+    return digest
+
+
+def preload(names=None):
+    for name in names or MODEL_FILES:
+        load_model(name)
+
+
+def model_stats():
+    """Load time and in-memory size for every artifact loaded so far."""
+    return {
+        name: {
+            "version": entry["version"],
+            "path": entry["path"],
+            "load_seconds": entry["load_seconds"],
+            "size_bytes": entry["size_bytes"],
+            "file_bytes": entry["file_bytes"],
+        }
+        for name, entry in _cache.items()
+    }
+
+
+def _estimate_size(obj, seen=None):
+    # Walks the object graph, counting numpy buffers by nbytes. Fitted sklearn
+    # trees and xgboost boosters keep their data behind __getstate__. `seen`
+    # holds on to what it has visited, so the temporary states that returns
+    # aren't freed and their ids reused by objects not yet counted.
+    if seen is None:
+        seen = {}
+    if id(obj) in seen:
+        return 0
+    seen[id(obj)] = obj
+
+    if isinstance(obj, np.ndarray):
+        if obj.dtype == object:
+            return obj.nbytes + sum(_estimate_size(item, seen) for item in obj.ravel())
+        return obj.nbytes if obj.base is None else obj.nbytes + sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(
+            _estimate_size(k, seen) + _estimate_size(v, seen) for k, v in obj.items()
+        )
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(_estimate_size(item, seen) for item in obj)
+
+    try:
+        state = obj.__getstate__()
+    except Exception:
+        state = getattr(obj, "__dict__", None)
+    if state is None:
+        return sys.getsizeof(obj)
+    return sys.getsizeof(obj) + _estimate_size(state, seen)
@@ -0,0 +1,240 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import explain
+import forest_engine
+import model_registry
+from prediction_cache import prediction_cache
+
+# "sklearn" runs the pickled model directly; "numpy" uses forest_engine's
+# flattened trees, which give identical probabilities with far less per-call
+# overhead. "auto" picks numpy for small batches, where that overhead
+# dominates, and sklearn's compiled tree walk for large ones. With an export
+# from `python -m forest_engine` the numpy engine maps the arrays, and the
+# pickle is only loaded once a large batch needs sklearn.
+PREDICTION_ENGINE = os.getenv("PREDICTION_ENGINE", "auto")
+AUTO_NUMPY_MAX_ROWS = 256
+
+feature_names = ['Age', 'Gender', 'BMI', 'Chol', 'TG', 'HDL', 'LDL']
+
+# Keys of the `input_data` dict built in risk_assessment_page, in model order
+input_keys = ['age', 'gender', 'bmi', 'chol', 'tg', 'hdl', 'ldl']
+
+# Same bounds the risk assessment form enforces on its number inputs
+feature_ranges = {
+    'age': (1, 120),
+    'gender': (0, 1),
+    'bmi': (10.0, 50.0),
+    'chol': (100, 300),
+    'tg': (50, 500),
+    'hdl': (20, 100),
+    'ldl': (50, 250),
+}
+
+# Decimal places kept when normalizing inputs into a cache key; matches the
+# step of each number input on the form
+cache_precision = {'age': 0, 'gender': 0, 'bmi': 2, 'chol': 0, 'tg': 0, 'hdl': 0, 'ldl': 0}
+
+# Accepted spellings for Gender in uploaded files (the form uses Male=1)
+gender_codes = {'male': 1, 'm': 1, '1': 1, 'female': 0, 'f': 0, '0': 0}
+
+
+def predict_heart_disease(input_data, engine=None):
+    """Probabilities for one patient; see predict_heart_disease_versioned."""
+    return predict_heart_disease_versioned(input_data, engine)[0]
+
+
+def predict_heart_disease_versioned(input_data, engine=None):
+    """(probabilities, model version) for one patient, via the shared prediction cache.
+
+    The version is that of the model that produced the probabilities, so
+    it can be stored with them even if a reload lands mid-request.
+    Inputs are rounded to the form's precision before lookup so
+    near-identical submissions share an entry; the key also carries the
+    model and scaler versions, and the cache is cleared whenever either
+    artifact changes.
+    """
+    versions = (model_registry.model_version("best_model"), model_registry.model_version("scaler"))
+    prediction_cache.set_versions(versions)
+
+    features = normalize_input(input_data)
+    proba = prediction_cache.get((features, versions))
+    if proba is None:
+        proba, versions = predict_heart_disease_batch_versioned(np.asarray([features], dtype=np.float64), engine)
+        proba = proba[0]
+        proba.setflags(write=False)
+        prediction_cache.put((features, versions), proba)
+    return proba, versions[0]
+
+
+def explain_heart_disease(input_data):
+    """Per-feature contributions to one patient's high-risk probability.
+
+    Cached next to the prediction under the same normalized key. Returns a
+    dict with `expected_value` (the model's average prediction) and
+    `contributions`, which map each feature to its share of the gap between
+    that average and the patient's probability. Raises ValueError if the
+    deployed model isn't a forest.
+    """
+    versions = (model_registry.model_version("best_model"), model_registry.model_version("scaler"))
+    features = normalize_input(input_data)
+    explanation = prediction_cache.get((features, versions, "explanation"))
+    if explanation is None:
+        explanations, versions = explain_heart_disease_batch_versioned(np.asarray([features], dtype=np.float64))
+        explanation = explanations[0]
+        prediction_cache.put((features, versions, "explanation"), explanation)
+    return explanation
+
+
+def explain_heart_disease_batch(rows):
+    return explain_heart_disease_batch_versioned(rows)[0]
+
+
+def explain_heart_disease_batch_versioned(rows):
+    X = validate_inputs(to_feature_matrix(rows))
+    # Scaler parameters, trees and table all come from one snapshot
+    compiled, versions = forest_engine.get_compiled_versioned("best_model")
+    explainer = explain.prepare("best_model", compiled, versions[0])
+    X_scaled = (X - compiled["scaler_mean"]) / compiled["scaler_scale"]
+    contributions = explain.shap_values(explainer, X_scaled)
+    return [
+        {
+            "expected_value": explainer["expected_value"],
+            "contributions": dict(zip(feature_names, row.tolist())),
+        }
+        for row in contributions
+    ], versions
+
+
+def normalize_input(input_data):
+    if isinstance(input_data, dict):
+        input_data = [input_data[key] for key in input_keys]
+    if len(input_data) != len(input_keys):
+        raise ValueError(f"Expected {len(input_keys)} feature values, got {len(input_data)}")
+    return tuple(
+        round(float(value), cache_precision[key]) for key, value in zip(input_keys, input_data)
+    )
+
+
+def predict_heart_disease_batch(rows, engine=None):
+    """Score many patients with a single scaler/model call.
+
+    `rows` is an N x 7 array in `feature_names` order, or a list of dicts
+    keyed like `input_keys`. Returns an N x 2 array of class probabilities.
+    """
+    return predict_heart_disease_batch_versioned(rows, engine)[0]
+
+
+def predict_heart_disease_batch_versioned(rows, engine=None):
+    """predict_heart_disease_batch plus the (model, scaler) versions that scored it."""
+    X = validate_inputs(to_feature_matrix(rows))
+    if len(X) == 0:
+        versions = (model_registry.model_version("best_model"), model_registry.model_version("scaler"))
+        return np.empty((0, 2)), versions
+    engine = engine or PREDICTION_ENGINE
+    if engine == "auto":
+        use_numpy = len(X) <= AUTO_NUMPY_MAX_ROWS and forest_engine.can_compile("best_model")
+        engine = "numpy" if use_numpy else "sklearn"
+    if engine == "numpy":
+        compiled, versions = forest_engine.get_compiled_versioned("best_model")
+        return forest_engine.predict_proba(compiled, X), versions
+    if engine != "sklearn":
+        raise ValueError(f"Unknown prediction engine: {engine}")
+    scaler, scaler_version = model_registry.load_versioned("scaler")
+    best_model, model_version = model_registry.load_versioned("best_model")
+    input_scaled = scaler.transform(pd.DataFrame(X, columns=feature_names))
+    return best_model.predict_proba(input_scaled), (model_version, scaler_version)
+
+
+def preload():
+    """Load what small batches are scored with, ahead of the first request.
+
+    That is the scaler and the compiled forest, mapped from its export when
+    there is one; the pickle is only read if the forest has to be compiled.
+    """
+    model_registry.load_model("scaler")
+    forest_engine.can_compile("best_model")
+
+
+def frame_to_features(df):
+    """Pull the 7 model features out of a CSV-style DataFrame.
+
+    Column names are matched case-insensitively against `feature_names`, and
+    Gender may be given as "Male"/"Female" as well as the model's 1/0.
+    """
+    columns = {str(col).strip().lower(): col for col in df.columns}
+    missing = [name for name in feature_names if name.lower() not in columns]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+
+    X = np.empty((len(df), len(feature_names)), dtype=np.float64)
+    for i, name in enumerate(feature_names):
+        values = df[columns[name.lower()]]
+        if name == 'Gender' and not pd.api.types.is_numeric_dtype(values):
+            values = values.astype(str).str.strip().str.lower().map(gender_codes)
+        X[:, i] = pd.to_numeric(values, errors='coerce')
+    return X
+
+
+def to_feature_matrix(rows):
+    if isinstance(rows, pd.DataFrame):
+        return frame_to_features(rows)
+    if isinstance(rows, np.ndarray):
+        X = rows.astype(np.float64, copy=False)
+    else:
+        rows = list(rows)
+        if rows and isinstance(rows[0], dict):
+            X = np.array([[row[key] for key in input_keys] for row in rows], dtype=np.float64)
+        else:
+            X = np.asarray(rows, dtype=np.float64)
+    if X.ndim == 1 and X.size == 0:
+        X = X.reshape(0, len(feature_names))
+    if X.ndim != 2 or X.shape[1] != len(feature_names):
+        raise ValueError(f"Expected an N x {len(feature_names)} feature matrix, got shape {X.shape}")
+    return X
+
+
+def valid_row_mask(X):
+    """Boolean mask of rows that pass the same checks as validate_inputs."""
+    mask = np.isfinite(X).all(axis=1)
+    for col, key in enumerate(input_keys):
+        low, high = feature_ranges[key]
+        mask &= (X[:, col] >= low) & (X[:, col] <= high)
+    mask &= np.isin(X[:, input_keys.index('gender')], (0, 1))
+    return mask
+
+
+def validate_inputs(X):
+    """Raise ValueError naming the first column with out-of-range values."""
+    if not np.isfinite(X).all():
+        raise ValueError("Feature values must be finite numbers")
+    for col, key in enumerate(input_keys):
+        low, high = feature_ranges[key]
+        bad = (X[:, col] < low) | (X[:, col] > high)
+        if bad.any():
+            row = int(np.argmax(bad))
+            raise ValueError(
+                f"{feature_names[col]} must be between {low} and {high} "
+                f"(row {row} has {X[row, col]:g}, {int(bad.sum())} row(s) out of range)"
+            )
+    gender = X[:, input_keys.index('gender')]
+    if not np.isin(gender, (0, 1)).all():
+        raise ValueError("Gender must be encoded as 0 (Female) or 1 (Male)")
+    return X
+
+
+def synthetic_inputs(n, seed=0):
+    """Random feature rows spread over the form's valid ranges."""
+    rng = np.random.default_rng(seed)
+    X = np.empty((n, len(input_keys)))
+    for col, key in enumerate(input_keys):
+        low, high = feature_ranges[key]
+        if key == 'gender':
+            X[:, col] = rng.integers(0, 2, size=n)
+        elif key == 'bmi':
+            X[:, col] = np.round(rng.uniform(low, high, size=n), 1)
+        else:
+            X[:, col] = rng.integers(low, high + 1, size=n)
+    return X
@@ -0,0 +1,98 @@
+"""Headless batch scorer.
+
+Usage:
+    python -m score patients.csv scored.csv [--workers N] [--shard-size ROWS]
+
+Reads the input CSV in shards, scores them in a process pool using the same
+preprocessing as predict_heart_disease, and writes the rows back out in input
+order with `risk_score` and `risk_category` columns appended. Rows with
+missing or out-of-range values are kept with an empty score.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import model_registry
+from prediction import frame_to_features, predict_heart_disease_batch, valid_row_mask
+
+
+def _init_worker():
+    # Each worker deserializes the scaler and model once, up front
+    model_registry.preload(["scaler", "best_model"])
+
+
+def score_shard(df):
+    X = frame_to_features(df)
+    valid = valid_row_mask(X)
+    risk_score = np.full(len(df), np.nan)
+    if valid.any():
+        risk_score[valid] = predict_heart_disease_batch(X[valid])[:, 1] * 100
+    df = df.copy()
+    df['risk_score'] = np.round(risk_score, 4)
+    df['risk_category'] = np.where(
+        valid, np.where(risk_score > 50, "High Risk", "Low Risk"), "Invalid"
+    )
+    return df
+
+
+def score_file(input_path, output_path, workers=None, shard_size=50000, log=None):
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    rows = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor, \
+            open(output_path, "w", newline="") as out:
+        pending = deque()
+        header = True
+
+        def write_oldest():
+            nonlocal header, rows
+            scored = pending.popleft().result()
+            scored.to_csv(out, header=header, index=False)
+            header = False
+            rows += len(scored)
+            if log:
+                elapsed = time.perf_counter() - start
+                log(f"{rows:,} rows scored ({rows / elapsed:,.0f} rows/s)")
+
+        # Results are written strictly in submission order; at most
+        # `max_in_flight` shards are held in memory at once
+        for shard in pd.read_csv(input_path, chunksize=shard_size):
+            pending.append(executor.submit(score_shard, shard))
+            if len(pending) >= max_in_flight:
+                write_oldest()
+        while pending:
+            write_oldest()
+
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV of patient metrics with the Cardio-AI model.")
+    parser.add_argument("input", help="CSV with Age, Gender, BMI, Chol, TG, HDL, LDL columns")
+    parser.add_argument("output", help="Where to write the scored CSV")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--shard-size", type=int, default=50000, help="Rows per shard (default: 50000)")
+    args = parser.parse_args(argv)
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    try:
+        rows = score_file(args.input, args.output, args.workers, args.shard_size, log=log)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    print(f"✅ Wrote {rows:,} rows to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""Bounded-size series for the risk history chart.
+
+Long histories are either summarised in SQL per day, week or month
+(DatabaseManager.get_risk_trend, bucket picked by choose_bucket) or, in raw
+mode, thinned with largest-triangle-three-buckets so the chart keeps the
+peaks and dips that a plain stride would drop. Either way the browser gets at
+most TREND_MAX_POINTS points.
+"""
+import os
+
+import numpy as np
+
+TREND_MAX_POINTS = int(os.getenv("TREND_MAX_POINTS", "500"))
+
+# Approximate bucket widths in days, finest first
+BUCKET_DAYS = {"day": 1, "week": 7, "month": 31}
+
+
+def choose_bucket(start_date, end_date, max_points=TREND_MAX_POINTS):
+    """Finest date_trunc unit that gives at most `max_points` buckets."""
+    span_days = (end_date - start_date).days + 1
+    for unit, days in BUCKET_DAYS.items():
+        if span_days / days <= max_points:
+            return unit
+    return "month"
+
+
+def lttb(x, y, n_out=TREND_MAX_POINTS):
+    """Indices of the points largest-triangle-three-buckets keeps.
+
+    `x` must be increasing. The first and last points are always kept; every
+    bucket in between contributes the point forming the largest triangle
+    with the previously kept point and the mean of the next bucket.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Interior points split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        area = np.abs(
+            (x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a])
+        )
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep